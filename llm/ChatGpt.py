@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 from rich import print
+from llm.Tracing import tracer
 import requests
 import base64
 import os
@@ -93,7 +94,8 @@ class LLM:
             "max_tokens": self.max_tokens
         }
         "" if not prompt else self.messages.pop()
-        response = self.session.post(url, headers=headers, json=data)
+        with tracer.span("llm.http", model=self.model):
+            response = self.session.post(url, headers=headers, json=data)
         print(response.json())
         return response.json()["choices"][0]["message"]["content"]
 
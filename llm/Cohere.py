@@ -2,6 +2,8 @@ import cohere
 import os
 from dotenv import load_dotenv
 from rich import print
+from llm.Tracing import tracer
+from llm.Sink import Sink, makeSink
 
 load_dotenv()
 
@@ -58,7 +60,7 @@ class LLM:
         self.verbose = verbose
         self.add_message(self.SYSTEM, self.system_prompt)
 
-    def run(self, prompt: str) -> str:
+    def run(self, prompt: str, sink: Sink | None = None) -> str:
         """
         Run the LLM
 
@@ -66,6 +68,9 @@ class LLM:
         ----------
         prompt : str
             The prompt to run
+        sink : Sink | None, optional
+            Where the streamed text goes, by default a console sink if verbose
+            and a NullSink otherwise
 
         Returns
         -------
@@ -77,22 +82,25 @@ class LLM:
         >>> llm.run("Hello, how are you?")
         "I'm doing well, thank you!"
         """
-        stream = self.co.chat_stream(
-            model = self.model,
-            message = prompt,
-            temperature = self.temperature,
-            chat_history = self.messages,
-            connectors = self.connectors,
-            preamble = self.system_prompt,
-            max_tokens = self.max_tokens,
-            )
-        response:str = ""
-        for event in stream:
-            if event.event_type == "text-generation":
-                if self.verbose:
-                    print(event.text, end='')
-                response += event.text
-        return response
+        sink = sink if sink is not None else makeSink(self.verbose)
+        with sink, tracer.span("llm.stream", model=self.model):
+            stream = self.co.chat_stream(
+                model = self.model,
+                message = prompt,
+                temperature = self.temperature,
+                chat_history = self.messages,
+                connectors = self.connectors,
+                preamble = self.system_prompt,
+                max_tokens = self.max_tokens,
+                )
+            first = True
+            for event in stream:
+                if event.event_type == "text-generation":
+                    if first:
+                        tracer.instant("llm.ttft")
+                        first = False
+                    sink.write(event.text)
+        return sink.getvalue()
 
     def add_message(self, role: str, content: str) -> None:
         """
@@ -0,0 +1,334 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from llm.Sink import Sink, makeSink
+from llm.Tracing import tracer
+from rich import print
+import mimetypes
+import hashlib
+import asyncio
+import json
+import time
+import os
+
+load_dotenv()
+
+# uploaded files are deleted by the API after 48 hours, keep a safety margin
+FILE_TTL = 47 * 60 * 60
+
+class FileCache:
+    """
+    Content-hash keyed cache of uploaded file handles.
+
+    Maps sha256(file bytes) + mime type to the uploaded file's `name`/`uri` and its
+    expiry time, persisted as JSON so the same media is not uploaded again across
+    runs while the remote copy is still alive.
+    """
+    def __init__(self, path: str = ".gemini_files.json") -> None:
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(file_path: str, mime_type: str | None) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return f"{digest.hexdigest()}:{mime_type or ''}"
+
+    def get(self, key: str) -> dict | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires"] <= time.time():
+            del self.entries[key]
+            return None
+        return entry
+
+    def put(self, key: str, file, expires: float) -> None:
+        self.entries[key] = {"name": file.name, "uri": getattr(file, "uri", ""), "expires": expires}
+
+    def drop(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        self.entries = {k: v for k, v in self.entries.items() if v["expires"] > now}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+def _expires(file) -> float:
+    expiration = getattr(file, "expiration_time", None)
+    if expiration is not None and hasattr(expiration, "timestamp"):
+        return expiration.timestamp() - 60 * 60
+    return time.time() + FILE_TTL
+
+
+class LLM:
+    USER = "user"
+    ASSISTANT = "model"
+    SYSTEM = "system"
+    def __init__(
+            self,
+            messages: list[dict] | None = None,
+            model: str = "gemini-1.5-flash",
+            temperature: float = 0.0,
+            system_prompt: str = "",
+            max_tokens: int = 8192,
+            verbose: bool = False,
+            api_key: str | None = None,
+            files_api = None,
+            genai_api = None,
+            cache: FileCache | None = None,
+            max_uploads: int = 4,
+            poll_interval: float = 0.5,
+            max_poll_interval: float = 8.0,
+            poll_timeout: float = 600.0,
+            ) -> None:
+        """
+        Initialize the Gemini LLM
+
+        Parameters
+        ----------
+        messages : list[dict] | None, optional
+            The list of messages in Gemini's {"role", "parts"} format, by default None
+        model : str, optional
+            The model to use, by default "gemini-1.5-flash"
+        temperature : float, optional
+            The temperature to use, by default 0.0
+        system_prompt : str, optional
+            The system instruction, by default ""
+        max_tokens : int, optional
+            The max output tokens, by default 8192
+        verbose : bool, optional
+            Print the response while it streams, by default False
+        api_key : str|None, optional
+            The api key to use, by default GEMINI_API_KEY from the environment
+        files_api : optional
+            Anything with `upload_file(path, mime_type=)` and `get_file(name)`,
+            by default the `google.generativeai` module. Pass a stub in tests.
+        genai_api : optional
+            Anything with `configure(api_key=)` and `GenerativeModel(...)`, by
+            default the `google.generativeai` module. Pass a stub in tests.
+        cache : FileCache | None, optional
+            Cache of uploaded files, by default `.gemini_files.json`
+        max_uploads : int, optional
+            Number of concurrent uploads / status polls, by default 4
+        poll_interval : float, optional
+            First delay between readiness polls in seconds, doubled each round, by default 0.5
+        max_poll_interval : float, optional
+            Upper bound of the poll delay, by default 8.0
+        poll_timeout : float, optional
+            Give up waiting for a file after this many seconds, by default 600.0
+
+        Examples
+        --------
+        >>> llm = LLM()
+        >>> llm.add_message("user", "What is in this picture?", files=["cat.jpeg"])
+        >>> llm.run()
+        """
+        self.api_key = api_key if api_key else os.getenv("GEMINI_API_KEY")
+        self.messages = messages if messages is not None else []
+        self.model = model
+        self.temperature = temperature
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.verbose = verbose
+        self.cache = cache if cache is not None else FileCache()
+        self.max_uploads = max_uploads
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_timeout = poll_timeout
+        self.files_api = files_api
+        self._genai = genai_api
+        self._configured = False
+        self._client = None
+        self._client_system = None
+
+    @property
+    def genai(self):
+        if self._genai is None:
+            import google.generativeai as genai
+            self._genai = genai
+        if not self._configured:
+            self._genai.configure(api_key=self.api_key)
+            self._configured = True
+        return self._genai
+
+    @property
+    def files(self):
+        if self.files_api is None:
+            self.files_api = self.genai
+        return self.files_api
+
+    def _split(self, messages: list[dict]) -> tuple[str, list[dict]]:
+        """Gemini has no "system" role in `contents`: those messages become the system instruction."""
+        system = [self.system_prompt] if self.system_prompt else []
+        contents = []
+        for message in messages:
+            if message["role"] == self.SYSTEM:
+                system.extend(part for part in message["parts"] if isinstance(part, str))
+            else:
+                contents.append(message)
+        return "\n\n".join(system), contents
+
+    def _model(self, system: str):
+        if self._client is None or system != self._client_system:
+            self._client_system = system
+            self._client = self.genai.GenerativeModel(
+                model_name=self.model,
+                generation_config={
+                    "temperature": self.temperature,
+                    "max_output_tokens": self.max_tokens,
+                    "response_mime_type": "text/plain",
+                },
+                system_instruction=system or None,
+            )
+        return self._client
+
+    @property
+    def client(self):
+        return self._model(self._split(self.messages)[0])
+
+    async def _upload_one(self, path: str, mime_type: str | None, limit: asyncio.Semaphore):
+        mime_type = mime_type or mimetypes.guess_type(path)[0]
+        async with limit:
+            key = await asyncio.to_thread(self.cache.key, path, mime_type)
+            entry = self.cache.get(key)
+            if entry is not None:
+                try:
+                    file = await asyncio.to_thread(self.files.get_file, entry["name"])
+                    if file.state.name != "FAILED":
+                        return key, file
+                except Exception:
+                    pass
+                self.cache.drop(key)
+            file = await asyncio.to_thread(self.files.upload_file, path, mime_type=mime_type)
+        if self.verbose:
+            print(f"Uploaded file '{file.display_name}' as: {file.uri}")
+        return key, file
+
+    async def _wait_active(self, key: str, file, limit: asyncio.Semaphore):
+        delay = self.poll_interval
+        deadline = time.monotonic() + self.poll_timeout
+        while file.state.name == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"File {file.name} still processing after {self.poll_timeout}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+            async with limit:
+                file = await asyncio.to_thread(self.files.get_file, file.name)
+        if file.state.name != "ACTIVE":
+            self.cache.drop(key)
+            raise Exception(f"File {file.name} failed to process")
+        self.cache.put(key, file, _expires(file))
+        return file
+
+    async def aupload(self, *paths: str | tuple[str, str]) -> list:
+        """
+        Uploads the given files concurrently (skipping ones already uploaded) and
+        waits until all of them are ACTIVE. Each path may be a `(path, mime_type)`
+        tuple; otherwise the mime type is guessed from the extension.
+
+        Returns
+        -------
+        list
+            The file handles, in the order of `paths`.
+        """
+        limit = asyncio.Semaphore(self.max_uploads)
+        items = [p if isinstance(p, tuple) else (p, None) for p in paths]
+        uploaded = await asyncio.gather(*(self._upload_one(path, mime, limit) for path, mime in items))
+        try:
+            return list(await asyncio.gather(*(self._wait_active(key, file, limit) for key, file in uploaded)))
+        finally:
+            self.cache.save()
+
+    def upload(self, *paths: str | tuple[str, str]) -> list:
+        """
+        Blocking wrapper around `aupload`.
+
+        Examples
+        --------
+        >>> audio, image = llm.upload(("talk.ogg", "audio/ogg"), "cat.jpeg")
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aupload(*paths))
+        # already inside an event loop (e.g. the CodeBrew server): use a helper thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.aupload(*paths)).result()
+
+    def run(self, prompt: str | None = None, sink: Sink | None = None) -> str:
+        """
+        Run the LLM
+
+        Parameters
+        ----------
+        prompt : str | None
+            The prompt to run, appended to the history for this call only
+        sink : Sink | None, optional
+            Where the streamed text goes, by default chosen from `verbose`
+
+        Returns
+        -------
+        str
+            The response
+        """
+        system, contents = self._split(self.messages)
+        contents = contents + ([{"role": self.USER, "parts": [prompt]}] if prompt else [])
+        sink = sink if sink is not None else makeSink(self.verbose)
+        with sink, tracer.span("llm.stream", model=self.model):
+            first = True
+            for chunk in self._model(system).generate_content(contents, stream=True):
+                if first and chunk.text:
+                    tracer.instant("llm.ttft")
+                    first = False
+                sink.write(chunk.text)
+        return sink.getvalue()
+
+    def add_message(self, role: str, content: str, files: list[str | tuple[str, str]] | None = None) -> None:
+        """
+        Add a message to the LLM
+
+        Parameters
+        ----------
+        role : str
+            The role of the message ("assistant" is mapped to Gemini's "model",
+            "system" messages are sent as the system instruction)
+        content : str
+            The content of the message
+        files : list[str | tuple[str, str]] | None, optional
+            Media to attach; uploaded concurrently and cached by content hash
+        """
+        role = self.ASSISTANT if role == "assistant" else role
+        parts: list = self.upload(*files) if files else []
+        if content:
+            parts.append(content)
+        if not parts:
+            raise ValueError("Both content and files are empty")
+        self.messages.append({"role": role, "parts": parts})
+
+    def __getitem__(self, index) -> dict | list[dict]:
+        if isinstance(index, (slice, int)):
+            return self.messages[index]
+        raise TypeError("Invalid argument type")
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, (slice, int)):
+            self.messages[index] = value
+        else:
+            raise TypeError("Invalid argument type")
+
+
+if __name__ == "__main__":
+    llm = LLM(verbose=True)
+    llm.add_message("user", "hello")
+    print(llm.run("can you tell me whats going on"))
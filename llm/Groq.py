@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
 from groq import Groq
+from llm.Tracing import tracer
+from llm.Sink import Sink, makeSink
 import os
 
 load_dotenv()
@@ -30,24 +32,28 @@ class LLM:
         self.client = Groq(api_key=api_key)
         self.add_message(self.SYSTEM, self.system_prompt)
 
-    def run(self, prompt: str) -> str:
+    def run(self, prompt: str, sink: Sink | None = None) -> str:
+        sink = sink if sink is not None else makeSink(self.verbose)
         self.add_message(self.USER, prompt)
-        stream = self.gr.chat.completions.create(
-            model=self.model,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            messages=self.messages,
-            stream=True,
-            stop=None
-        )
-        self.messages.pop()
-        r=""
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                r += chunk.choices[0].delta.content
-            if self.verbose:
-                print(chunk.choices[0].delta.content or "", end="")
-        return r
+        with sink, tracer.span("llm.stream", model=self.model):
+            stream = self.gr.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                messages=self.messages,
+                stream=True,
+                stop=None
+            )
+            self.messages.pop()
+            first = True
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first:
+                        tracer.instant("llm.ttft")
+                        first = False
+                    sink.write(delta)
+        return sink.getvalue()
 
     def add_message(self, role: str, content: str) -> None:
         self.messages.append({"role": role, "content": content})
@@ -0,0 +1,116 @@
+"""
+Output sinks for streamed LLM responses.
+
+Every sink accumulates the deltas in a list (joined once at the end, instead of
+the quadratic `response += delta`) and differs only in how, or whether, it shows
+them while streaming:
+
+- `NullSink` renders nothing (headless runs, servers, benchmarks).
+- `ThrottledSink` writes raw text to a stream at most `fps` times per second.
+- `LiveSink` shows the response in a Rich `Live` view refreshed at `fps` Hz.
+
+Use a sink as a context manager, so a stream that fails halfway still stops
+the live view and flushes the buffered text:
+
+>>> with makeSink(verbose=True) as sink:
+...     for delta in stream:
+...         sink.write(delta)
+>>> response = sink.getvalue()
+"""
+import time
+import sys
+
+class Sink:
+    def __init__(self) -> None:
+        self.parts: list[str] = []
+
+    def write(self, text: str) -> None:
+        if text:
+            self.parts.append(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+    def close(self) -> str:
+        """
+        Finishes rendering and returns the whole response.
+        """
+        return self.getvalue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class NullSink(Sink):
+    """Accumulates only."""
+
+class ThrottledSink(Sink):
+    def __init__(self, fps: float = 30.0, stream = None) -> None:
+        """
+        Parameters
+        ----------
+        fps : float, optional
+            Maximum number of writes to the console per second, by default 30.0
+        stream : optional
+            Text stream to write to, by default sys.stdout
+        """
+        super().__init__()
+        self.interval = 1.0 / fps
+        self.stream = stream or sys.stdout
+        self.flushed = 0
+        self.last = 0.0
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self.parts.append(text)
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.flush()
+            self.last = now
+
+    def flush(self) -> None:
+        if self.flushed < len(self.parts):
+            self.stream.write("".join(self.parts[self.flushed:]))
+            self.stream.flush()
+            self.flushed = len(self.parts)
+
+    def close(self) -> str:
+        self.flush()
+        return self.getvalue()
+
+class LiveSink(Sink):
+    def __init__(self, fps: float = 30.0, console = None) -> None:
+        """
+        Parameters
+        ----------
+        fps : float, optional
+            Refresh rate of the live view, by default 30.0
+        console : rich.console.Console, optional
+            Console to render on, by default a new one
+        """
+        from rich.live import Live
+        from rich.text import Text
+        super().__init__()
+        self.text = Text()
+        self.live = Live(self.text, console=console, refresh_per_second=fps, auto_refresh=True)
+        self.live.start()
+
+    def write(self, text: str) -> None:
+        if text:
+            self.parts.append(text)
+            self.text.append(text)  # plain append, no markup parsing per token
+
+    def close(self) -> str:
+        if self.live.is_started:
+            self.live.stop()
+        return self.getvalue()
+
+def makeSink(verbose: bool = False, live: bool = False, fps: float = 30.0) -> Sink:
+    if not verbose:
+        return NullSink()
+    if live:
+        return LiveSink(fps=fps)
+    return ThrottledSink(fps=fps)
@@ -0,0 +1,186 @@
+"""
+Lightweight nested span tracing with Chrome trace export.
+
+    from llm.Tracing import tracer
+    with tracer.span("llm.request", model=llm.model):
+        ...
+    tracer.instant("llm.ttft")
+    tracer.export("trace.json")   # open in chrome://tracing or ui.perfetto.dev
+
+Tracing is off unless `TRACE_SAMPLE_RATE` (0..1) is set in the environment or
+`tracer.configure(...)` is called. While off, `span()` returns a shared no-op
+context manager, so an instrumented call costs one attribute check.
+
+Sampling is decided once per root span (a whole turn): either every nested span
+of that turn is recorded or none is, so sampled traces are always complete.
+If `TRACE_FILE` is set, the trace is written there when the process exits.
+
+It lives in `llm` so the providers can be instrumented without depending on the
+plugin layer; plugins import it through `plugins.tracing`.
+"""
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+import threading
+import atexit
+import random
+import json
+import time
+import os
+
+_sampled: ContextVar[bool | None] = ContextVar("trace_sampled", default=None)
+
+class _NullSpan:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc) -> None:
+        return None
+    def set(self, **args) -> None:
+        return None
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start", "token")
+    def __init__(self, tracer: "Tracer", name: str, args: dict, token) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.token = token
+        self.start = 0
+
+    def set(self, **args) -> None:
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, "X", self.start, end - self.start, self.args)
+        if self.token is not None:
+            _sampled.reset(self.token)
+
+class Tracer:
+    def __init__(self, sampleRate: float = 0.0, maxEvents: int = 200_000) -> None:
+        """
+        Parameters
+        ----------
+        sampleRate : float, optional
+            Fraction of root spans (turns) to record, by default 0.0 (off)
+        maxEvents : int, optional
+            Ring buffer size; the oldest events are dropped first, by default 200_000
+        """
+        self.enabled = False
+        self.sampleRate = 0.0
+        self.events: deque[dict] = deque(maxlen=maxEvents)
+        self.pid = os.getpid()
+        self.configure(sampleRate)
+
+    def configure(self, sampleRate: float = 1.0, maxEvents: int | None = None) -> None:
+        self.sampleRate = max(0.0, min(1.0, sampleRate))
+        self.enabled = self.sampleRate > 0
+        if maxEvents is not None:
+            self.events = deque(self.events, maxlen=maxEvents)
+
+    def span(self, name: str, **args):
+        """
+        Context manager timing `name`. Extra keyword arguments end up in the
+        event's `args` in the exported trace.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        sampled = _sampled.get()
+        if sampled is None:
+            # root span: decide for the whole tree below it
+            sampled = self.sampleRate >= 1.0 or random.random() < self.sampleRate
+            return Span(self, name, args, _sampled.set(sampled)) if sampled else _RootSkip(_sampled.set(False))
+        if not sampled:
+            return NULL_SPAN
+        return Span(self, name, args, None)
+
+    def instant(self, name: str, **args) -> None:
+        """
+        Records a zero-length marker (e.g. time to first token) in the current trace.
+        """
+        if self.enabled and _sampled.get():
+            self._record(name, "i", time.perf_counter_ns(), 0, args)
+
+    def _record(self, name: str, ph: str, start: int, dur: int, args: dict) -> None:
+        event = {
+            "name": name,
+            "ph": ph,
+            "ts": start / 1000,
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if ph == "X":
+            event["dur"] = dur / 1000
+        else:
+            event["s"] = "t"
+        if args:
+            event["args"] = {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v) for k, v in args.items()}
+        self.events.append(event)
+
+    def export(self, path: str) -> str:
+        """
+        Writes the recorded events as Chrome trace JSON and returns the path.
+        """
+        threads = {e["tid"] for e in self.events}
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": _threadName(tid)}}
+            for tid in threads
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + list(self.events), "displayTimeUnit": "ms"}, f)
+        return path
+
+    def clear(self) -> None:
+        self.events.clear()
+
+class _RootSkip:
+    """Root span of an unsampled turn: records nothing but marks the turn as skipped."""
+    __slots__ = ("token",)
+    def __init__(self, token) -> None:
+        self.token = token
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc) -> None:
+        _sampled.reset(self.token)
+    def set(self, **args) -> None:
+        return None
+
+def _threadName(tid: int) -> str:
+    for thread in threading.enumerate():
+        if thread.ident == tid:
+            return thread.name
+    return str(tid)
+
+def traced(name: str | None = None):
+    """
+    Decorator version of `tracer.span`.
+
+    Examples
+    --------
+    >>> @traced("db.query")
+    ... def query(...): ...
+    """
+    def decorator(func):
+        spanName = name or func.__qualname__
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(spanName):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+tracer = Tracer(float(os.getenv("TRACE_SAMPLE_RATE", "0") or 0))
+
+if os.getenv("TRACE_FILE"):
+    atexit.register(lambda: tracer.events and tracer.export(os.environ["TRACE_FILE"]))
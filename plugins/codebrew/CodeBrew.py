@@ -1,14 +1,22 @@
 try:from llm.example import LLM
 except:...
 
+from plugins.codebrew.Journal import SessionJournal
+from plugins.tracing import tracer
 from nara.extra import JsonList
 from dotenv import get_key
+from concurrent.futures import Executor
 import subprocess
 import tempfile
+import contextvars
+import asyncio
 import sys
 import json
 import re
 
+def pythonExe() -> str:
+    return rf'{get_key(".env", "PYTHON_EXE") or sys.executable}'
+
 class CodeBrew:
     def __init__(
             self,
@@ -16,11 +24,19 @@ class CodeBrew:
             maxRetries: int = 3,
             keepHistory: bool = True,
             verbose: bool = False,
+            echo: bool = True,
+            journal: SessionJournal | None = None,
             ) -> None:
         self.llm:LLM = llm
         self.maxRetries = maxRetries
         self.keepHistory = keepHistory
         self.verbose = verbose
+        self.echo = echo
+        self.journal = journal
+        if journal is not None:
+            resumed = journal.load()
+            if resumed:
+                self.llm.messages = resumed
 
     def filterCode(self, txt):
         pattern = r"```python(.*?)```"
@@ -28,42 +44,46 @@ class CodeBrew:
         for _match in matches:return _match.strip()
     
     def pipPackages(self, *packages: str):
-        python_executable = rf'{get_key(".env", "PYTHON_EXE")}'
+        python_executable = pythonExe()
         print(f"Installing {', '.join(packages)} with pip...")
-        return subprocess.run(
-            [python_executable, "-m", "pip", "install", *packages],
-            capture_output=True,
-            check=True,
-        )
+        with tracer.span("pip.install", packages=" ".join(packages)):
+            return subprocess.run(
+                [python_executable, "-m", "pip", "install", *packages],
+                capture_output=True,
+                check=True,
+            )
     
     def _execute_script_in_subprocess(self, script) -> tuple[str, str, int]:
         output, error, return_code = "", "", 0
         try:
-            python_executable = rf'{get_key(".env", "PYTHON_EXE")}'
+            python_executable = pythonExe()
             with tempfile.NamedTemporaryFile(mode="w+", delete=False) as tmp_script:
                 tmp_script_name = tmp_script.name
                 tmp_script.write(script)
                 tmp_script.flush()
 
-                process = subprocess.Popen(
-                    [python_executable, tmp_script_name],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.DEVNULL,  # Raises EOF error if subprocess asks for input
-                    text=True,
-                )
-                while True:
-                    _stdout = process.stdout.readline()
-                    _stderr = process.stderr.readline()
-                    if _stdout:
-                        output += _stdout
-                        print(_stdout, end="")
-                    if _stderr:
-                        error += _stderr
-                        print(_stderr, end="", file=sys.stderr)
-                    if _stdout == "" and _stderr == "" and process.poll() is not None:
-                        break
-                return_code = process.returncode
+                with tracer.span("subprocess.spawn"):
+                    process = subprocess.Popen(
+                        [python_executable, tmp_script_name],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        stdin=subprocess.DEVNULL,  # Raises EOF error if subprocess asks for input
+                        text=True,
+                    )
+                with tracer.span("subprocess.run") as span:
+                    while True:
+                        _stdout = process.stdout.readline()
+                        _stderr = process.stderr.readline()
+                        if _stdout:
+                            output += _stdout
+                            if self.echo:print(_stdout, end="")
+                        if _stderr:
+                            error += _stderr
+                            if self.echo:print(_stderr, end="", file=sys.stderr)
+                        if _stdout == "" and _stderr == "" and process.poll() is not None:
+                            break
+                    return_code = process.returncode
+                    span.set(returncode=return_code)
         except Exception as e:
             error += str(e)
             print(e)
@@ -71,34 +91,102 @@ class CodeBrew:
         return output, error, return_code
 
     def execute_script(self, script: str) -> tuple[str, str, int]:
-        return self._execute_script_in_subprocess(script)
+        with tracer.span("script.execute"):
+            return self._execute_script_in_subprocess(script)
     
-    def run(self, prompt: str) -> ...:
-        the_copy = self.llm.messages.copy()
-        self.llm.add_message("user", prompt)
-        _continue = True
-        while _continue:
-            _continue = False
-            error, script, output, return_code = "", "", "", 0
-            try:
-                response = self.llm.run()
-                self.llm.add_message("assistant", response)
-                script = self.filterCode(response)
-                if script:
-                    output, error, return_code = self.execute_script(script)
-            except KeyboardInterrupt:
-                break
+    def _afterStep(self, output: str, error: str, return_code: int, retries: int) -> tuple[bool, int]:
+        _continue = False
+        with tracer.span("history.append"):
             if output:
                 self.llm.add_message("user", f"LAST SCRIPT OUTPUT:\n{output}")
                 if output.strip().endswith("CONTINUE"):
                     _continue = True
             if error:
                 self.llm.add_message("user", f"Error: {error}")
-            if return_code != 0:
-                self.maxRetries -= 1
-                if self.maxRetries > 0:
-                    print("Retrying...\n")
-                    _continue = True
+        if return_code != 0:
+            retries -= 1
+            if retries > 0:
+                if self.echo:print("Retrying...\n")
+                _continue = True
+        return _continue, retries
+
+    def _beginTurn(self, prompt: str) -> list:
+        """Adds the prompt and returns the history to restore when `keepHistory` is off."""
+        with tracer.span("prompt.build"):
+            the_copy = self.llm.messages.copy()
+            self.llm.add_message("user", prompt)
+        return the_copy
+
+    def _takeResponse(self, response: str) -> str | None:
+        """Records the LLM response and returns the script in it, if any."""
+        with tracer.span("history.append"):
+            self.llm.add_message("assistant", response)
+        with tracer.span("code.extract"):
+            return self.filterCode(response)
+
+    def _endTurn(self, the_copy: list) -> None:
         if not self.keepHistory:
             self.llm.messages = the_copy
-    
+        if self.journal is not None:
+            with tracer.span("journal.sync"):
+                self.journal.sync(self.llm.messages)
+
+    def run(self, prompt: str) -> str:
+        """
+        Runs the prompt to completion and returns the collected script output.
+        """
+        with tracer.span("codebrew.turn"):
+            the_copy = self._beginTurn(prompt)
+            retries = self.maxRetries
+            outputs: list[str] = []
+            _continue = True
+            try:
+                while _continue:
+                    error, output, return_code = "", "", 0
+                    try:
+                        with tracer.span("llm.request"):
+                            response = self.llm.run()
+                        script = self._takeResponse(response)
+                        if script:
+                            output, error, return_code = self.execute_script(script)
+                    except KeyboardInterrupt:
+                        break
+                    outputs.append(output)
+                    _continue, retries = self._afterStep(output, error, return_code, retries)
+            finally:
+                self._endTurn(the_copy)
+        return "".join(outputs)
+
+    async def arun(
+            self,
+            prompt: str,
+            llmExecutor: Executor | None = None,
+            scriptExecutor: Executor | None = None,
+            ) -> str:
+        """
+        Same as `run` but never blocks the event loop: the (synchronous) LLM
+        request and the script subprocess are handed to the given executors,
+        so the caller decides how many of each may be in flight at once.
+        """
+        loop = asyncio.get_running_loop()
+        with tracer.span("codebrew.turn"):
+            the_copy = self._beginTurn(prompt)
+            retries = self.maxRetries
+            outputs: list[str] = []
+            _continue = True
+            try:
+                while _continue:
+                    error, output, return_code = "", "", 0
+                    # executors don't inherit contextvars, so carry the trace over
+                    with tracer.span("llm.request"):
+                        response = await loop.run_in_executor(llmExecutor, contextvars.copy_context().run, self.llm.run)
+                    script = self._takeResponse(response)
+                    if script:
+                        output, error, return_code = await loop.run_in_executor(
+                            scriptExecutor, contextvars.copy_context().run, self.execute_script, script
+                        )
+                    outputs.append(output)
+                    _continue, retries = self._afterStep(output, error, return_code, retries)
+            finally:
+                self._endTurn(the_copy)
+        return "".join(outputs)
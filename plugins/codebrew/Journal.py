@@ -0,0 +1,166 @@
+import hashlib
+import json
+import mmap
+import os
+
+class SessionJournal:
+    """
+    Append-only JSONL journal of an LLM message list.
+
+    Every record is one line, either `{"a": message}` (append) or `{"t": n}`
+    (truncate to n messages, written when `keepHistory=False` rolls a turn back).
+    Every `snapshotEvery` records the full list is written to `<sid>.snap.json`
+    together with the log offset it covers, so resuming only has to parse the
+    snapshot in one `json.loads` plus the (memory mapped) tail of the log. The
+    snapshot also stores a digest of the log bytes just before its offset; if the
+    log is shorter than the offset or those bytes differ (the log was truncated or
+    replaced), the snapshot is ignored and the whole log is replayed.
+
+    Examples
+    --------
+    >>> journal = SessionJournal("sessions", "alice")
+    >>> llm.messages = journal.load() or llm.messages
+    >>> ...
+    >>> journal.sync(llm.messages)
+    """
+    def __init__(self, directory: str, sid: str, snapshotEvery: int = 500, durable: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        directory : str
+            Folder holding the journals, created if missing.
+        sid : str
+            Session id, used as the file name.
+        snapshotEvery : int, optional
+            Number of log records between compacted snapshots, by default 500
+        durable : bool, optional
+            fsync after every sync, by default False
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.logPath = os.path.join(directory, f"{sid}.jsonl")
+        self.snapPath = os.path.join(directory, f"{sid}.snap.json")
+        self.snapshotEvery = snapshotEvery
+        self.durable = durable
+        self.messages: list[dict] = []
+        self.sinceSnapshot = 0
+        self._file = None
+        self._last = None
+
+    def load(self) -> list[dict]:
+        """
+        Rebuilds the message list from the snapshot and the log tail.
+        """
+        messages: list[dict] = []
+        offset = 0
+        size = os.path.getsize(self.logPath) if os.path.exists(self.logPath) else 0
+        if os.path.exists(self.snapPath):
+            with open(self.snapPath, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            if snap["offset"] <= size and snap.get("tail", self._tail(snap["offset"])) == self._tail(snap["offset"]):
+                messages, offset = snap["messages"], snap["offset"]
+
+        records = []
+        end = offset
+        if size > offset:
+            with open(self.logPath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = mm.rfind(b"\n") + 1  # a torn last line from a crash is dropped
+                if end > offset:
+                    # one C-level parse for the whole tail instead of one per line
+                    records = json.loads(b"[" + mm[offset:end - 1].replace(b"\n", b",") + b"]")
+                else:
+                    end = offset
+        for record in records:
+            if "a" in record:
+                messages.append(record["a"])
+            else:
+                del messages[record["t"]:]
+
+        self._open(end)
+        self.messages = messages
+        self.sinceSnapshot = len(records)
+        self._last = messages[-1] if messages else None
+        return list(messages)
+
+    def _tail(self, offset: int) -> str:
+        """Digest of the (up to) 256 log bytes before `offset`."""
+        if offset <= 0 or not os.path.exists(self.logPath):
+            return ""
+        with open(self.logPath, "rb") as f:
+            f.seek(max(0, offset - 256))
+            return hashlib.sha1(f.read(min(offset, 256))).hexdigest()
+
+    def _open(self, end: int) -> None:
+        if self._file is None:
+            self._file = open(self.logPath, "ab")
+        if self._file.tell() > end:
+            self._file.truncate(end)
+            self._file.seek(end)
+
+    def _write(self, records: list[dict]) -> None:
+        if not records:
+            return
+        self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
+        self.sinceSnapshot += len(records)
+
+    def append(self, message: dict) -> None:
+        if self._file is None:
+            self.load()
+        self.messages.append(message)
+        self._last = message
+        self._write([{"a": message}])
+        if self.sinceSnapshot >= self.snapshotEvery:
+            self.snapshot()
+
+    def sync(self, messages: list[dict]) -> None:
+        """
+        Journals whatever changed in `messages` since the last sync. Only the new
+        messages are written, so the cost is proportional to the turn, not to
+        the length of the conversation.
+        """
+        if self._file is None:
+            self.load()
+        known = len(self.messages)
+        records: list[dict] = []
+        if known and (len(messages) < known or messages[known - 1] is not self._last):
+            # history was rolled back or replaced: find the common prefix
+            keep = 0
+            for old, new in zip(self.messages, messages):
+                if old is not new and old != new:
+                    break
+                keep += 1
+            records.append({"t": keep})
+            del self.messages[keep:]
+            known = keep
+        for message in messages[known:]:
+            records.append({"a": message})
+            self.messages.append(message)
+        self._last = self.messages[-1] if self.messages else None
+        self._write(records)
+        if self.sinceSnapshot >= self.snapshotEvery:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """
+        Writes a compacted snapshot covering everything logged so far.
+        """
+        if self._file is None:
+            return
+        tmp = self.snapPath + ".tmp"
+        offset = self._file.tell()
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "tail": self._tail(offset), "messages": self.messages}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapPath)
+        self.sinceSnapshot = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self.messages)
@@ -1,11 +1,52 @@
 from chromadb.utils import embedding_functions
 from rich import print
 from nara.extra import TimeIt
-from db.embeddingCls import Model, paraphrase_MiniLM_L3_v2, all_mpnet_base_v2
+from plugins.tracing import tracer
+try:from db.embeddingCls import Model, paraphrase_MiniLM_L3_v2, all_mpnet_base_v2
+except ImportError:from plugins.codebrew.db.embeddingCls import Model, paraphrase_MiniLM_L3_v2, all_mpnet_base_v2
+try:from db.cacheCls import EmbeddingCache, CachedEmbeddingFunction, LRUCache, textKey
+except ImportError:from plugins.codebrew.db.cacheCls import EmbeddingCache, CachedEmbeddingFunction, LRUCache, textKey
+try:from db.storeCls import VectorStore, ChromaStore, NumpyStore
+except ImportError:from plugins.codebrew.db.storeCls import VectorStore, ChromaStore, NumpyStore
+try:from db.embedServer import RemoteEmbeddingFunction
+except ImportError:from plugins.codebrew.db.embedServer import RemoteEmbeddingFunction
+try:from db.bm25Cls import BM25Index, rrf
+except ImportError:from plugins.codebrew.db.bm25Cls import BM25Index, rrf
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from collections import deque
+from typing import Iterable, Iterator
+import itertools
+import time
+import os
 import json
 import chromadb
 
+def embeddingFunction(model_name:str, api_key:str = "", server:str|None = None):
+    if server:
+        return RemoteEmbeddingFunction(model_name, server)
+    if api_key:
+        return embedding_functions.HuggingFaceEmbeddingFunction(api_key = api_key, model_name = model_name)
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+_workerEf = None
+
+def _initWorker(model_name:str, api_key:str, server:str|None = None) -> None:
+    global _workerEf
+    _workerEf = embeddingFunction(model_name, api_key, server)
+
+def _embedInWorker(docs:list[str]) -> list[list[float]]:
+    if not docs:
+        return []
+    return [list(map(float, e)) for e in _workerEf(docs)]
+
+def _pdfChunks(pdf_path:str, start:int, stop:int, chunk_size:int, chunk_overlap:int) -> list[tuple[int, list[str]]]:
+    """Extracts and splits pages [start, stop) of a PDF; runs in pool workers."""
+    import fitz  # PyMuPDF
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, is_separator_regex=False)
+    with fitz.open(pdf_path) as pdf:
+        return [(page_num, splitter.split_text(pdf.load_page(page_num).get_text())) for page_num in range(start, stop)]
+
 class Db:
     def __init__(self,
                 api_key:str = "",
@@ -14,9 +55,16 @@ class Db:
                 persistent:bool = False,
                 name:str = "my_db",
                 collection_name:str = "my_collection",
-                saperator:str = "\n[+]\n"
+                saperator:str = "\n[+]\n",
+                embeddingCache:str|None = "default",
+                store:str|VectorStore = "chroma",
+                quantize:bool = False,
+                queryCacheSize:int = 1024,
+                embeddingServer:str|None = None,
                 ):
         self.api_key:str = api_key
+        # shared embedding daemon (see embedServer), instead of loading the model in this process
+        self.embeddingServer:str|None = embeddingServer or os.getenv("CODEBREW_EMBED_SOCKET") or None
         self.model:Model = model
         self.verbose:bool = verbose
         self.docs:list[str] = []
@@ -24,28 +72,80 @@ class Db:
         self.persistent:bool = persistent
         self.collection_name:str = collection_name
         self.saperator:str = saperator
+        if embeddingCache == "default":
+            # an in-memory Db leaves no files behind: its cache lives as long as the process
+            embeddingCache = os.path.join(name, "embeddings.sqlite") if persistent else ":memory:"
+        self.embeddingCache:EmbeddingCache|None = EmbeddingCache(embeddingCache) if embeddingCache else None
         self.embedingFunction = self._Db()
-        self.chroma_client = self._clint()
-        self.collection = self._collection()
+        self.chroma_client = None
+        self.collection = None
+        self.store:VectorStore = self._store(store, quantize)
+        self.queryEmbeddings = LRUCache(queryCacheSize)
+        self.queryResults = LRUCache(queryCacheSize)  # cleared on every write
+        self._lexicon:BM25Index|None = None
+        self.watermarksPath:str|None = os.path.join(name, f"{collection_name}.watermarks.json") if persistent else None
+        self.watermarks:dict[str, int] = {}
+        self.lastIndexed:dict[str, str] = {}  # message ID at watermark - 1, per session
+        if self.watermarksPath and os.path.exists(self.watermarksPath):
+            with open(self.watermarksPath, "r", encoding="utf-8") as f:
+                for session, mark in json.load(f).items():
+                    self.watermarks[session], self.lastIndexed[session] = mark if isinstance(mark, list) else (mark, "")
+        self.chunk_size:int = 800
+        self.chunk_overlap:int = 150
         self.text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=150,
+        chunk_size=self.chunk_size,
+        chunk_overlap=self.chunk_overlap,
         length_function=len,
         is_separator_regex=False,
         )
     
     def _Db(self):
-        if self.api_key:
-            huggingface_ef = embedding_functions.HuggingFaceEmbeddingFunction(
-            api_key = self.api_key,
-            model_name = self.model.model_name
-            )
+        ef = embeddingFunction(self.model.model_name, self.api_key, self.embeddingServer)
+        if self.embeddingCache is not None:
+            return CachedEmbeddingFunction(ef, self.model.model_name, self.embeddingCache)
+        return ef
 
-            return huggingface_ef
-        else:
-            sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=self.model.model_name)
+    def docId(self, doc:str, meta:dict|None = None) -> str:
+        """
+        Content-hash ID, scoped by the `source` metadata when there is one, so the
+        same chunk in two sources is stored twice and `deleteSource` of one never
+        touches the other.
+        """
+        source = (meta or {}).get("source")
+        return textKey(doc if source is None else f"{source}\0{doc}", self.model.model_name)
+
+    def _store(self, store:str|VectorStore, quantize:bool) -> VectorStore:
+        if isinstance(store, VectorStore):
+            return store
+        if store == "numpy":
+            return NumpyStore(os.path.join(self.name, self.collection_name) if self.persistent else None, quantize=quantize)
+        if store == "chroma":
+            self.chroma_client = self._clint()
+            self.collection = self._collection()
+            return ChromaStore(self.collection)
+        raise ValueError(f"Unknown store {store!r}, use 'chroma', 'numpy' or a VectorStore")
+
+    @property
+    def lexicon(self) -> BM25Index:
+        """
+        BM25 index over the stored documents, built from the store on first use
+        and then kept up to date by every write.
+        """
+        if self._lexicon is None:
+            index = BM25Index()
+            ids, docs, metas = [], [], []
+            for id_, doc, meta in self.store.items():
+                ids.append(id_)
+                docs.append(doc)
+                metas.append(meta)
+            index.add(ids, docs, metas)
+            self._lexicon = index
+        return self._lexicon
 
-            return sentence_transformer_ef
+    def _indexed(self, ids:list[str], docs:list[str], metadatas:list|None) -> None:
+        if self._lexicon is not None:
+            self._lexicon.add(ids, docs, metadatas)
+        self.queryResults.clear()
 
     def _clint(self):
         if self.persistent:
@@ -61,25 +161,266 @@ class Db:
             return value
 
     def add(self, docs:list[str],metadatas:list[dict[str, str]]|None = None, ids:list[str]|None = None):
-        def random_id():
-            import random
-            import string
-            return ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-        self.collection.add(
+        """
+        Upserts `docs`. Without explicit `ids` every document gets a content-hash
+        ID (see `docId`), so adding the same text twice keeps a single copy and
+        only texts the embedding cache has never seen are embedded.
+        """
+        ids = ids if ids else [self.docId(doc, metadatas[i] if metadatas else None) for i, doc in enumerate(docs)]
+        unique:dict[str, int] = {}
+        for inx, id_ in enumerate(ids):
+            unique[id_] = inx  # chroma rejects duplicate ids within one call, last one wins
+        keep = sorted(unique.values())
+        if len(keep) != len(ids):
+            docs = [docs[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep] if metadatas else None
+        self.store.upsert(
+            ids=ids,
             documents=docs,
+            embeddings=self.embedingFunction(docs),
             metadatas=metadatas,
-            ids=ids if ids else [random_id() for _ in range(len(docs))]
             )
+        self._indexed(ids, docs, metadatas)
+
+    def addStream(self, docs:Iterable[str|tuple[str, dict]], batchSize:int = 64, workers:int = 1) -> dict[str, float]:
+        """
+        Streams documents into the collection in batches.
+
+        Only a few batches are held in memory at once: while batch N is being
+        written, batch N+1 is already embedding. With `workers > 1` batches are
+        embedded in a process pool (one model copy per worker) so multi-core
+        CPUs are used; results are still written in input order.
+
+        Documents get content-hash IDs: ones already in the collection are
+        skipped and cached embeddings are reused, so re-ingesting a corpus only
+        embeds and writes what changed.
+
+        Parameters
+        ----------
+        docs : Iterable[str | tuple[str, dict]]
+            Documents, or (document, metadata) pairs. Can be a generator.
+        batchSize : int, optional
+            Documents per embedding call, by default 64
+        workers : int, optional
+            Embedding processes, by default 1 (embed in this process)
+
+        Returns
+        -------
+        dict[str, float]
+            docs, skipped, cached, batches, seconds, docs/s, embed_s and write_s.
+        """
+        stats = {"docs": 0, "skipped": 0, "cached": 0, "batches": 0, "embed_s": 0.0, "write_s": 0.0}
+        start = time.perf_counter()
+
+        cached = isinstance(self.embedingFunction, CachedEmbeddingFunction)
+
+        def batches():
+            it = iter(docs)
+            seen:set[str] = set()
+            while batch := list(itertools.islice(it, batchSize)):
+                texts, metas, ids = [], [], []
+                for d in batch:
+                    text, meta = d if isinstance(d, tuple) else (d, None)
+                    id_ = self.docId(text, meta)
+                    if id_ in seen:
+                        stats["skipped"] += 1
+                        continue
+                    seen.add(id_)
+                    texts.append(text)
+                    metas.append(meta)
+                    ids.append(id_)
+                if ids:
+                    existing = self.store.existing(ids)
+                    if existing:
+                        stats["skipped"] += len(existing)
+                        keep = [i for i, id_ in enumerate(ids) if id_ not in existing]
+                        texts, metas, ids = [texts[i] for i in keep], [metas[i] for i in keep], [ids[i] for i in keep]
+                if not ids:
+                    continue
+                if any(metas):
+                    metas = [meta or {} for meta in metas]  # chroma wants all dicts or None
+                else:
+                    metas = None
+                if cached:
+                    vectors, missing = self.embedingFunction.lookup(texts)
+                    stats["cached"] += len(texts) - len(missing)
+                else:
+                    vectors, missing = [None] * len(texts), list(range(len(texts)))
+                yield {"texts": texts, "metas": metas, "ids": ids, "vectors": vectors, "missing": missing}
+
+        def toEmbed(batch:dict) -> list[str]:
+            return [batch["texts"][i] for i in batch["missing"]]
+
+        def embedLocal(texts:list[str]) -> list:
+            return self.embedingFunction.ef(texts) if cached else self.embedingFunction(texts)
+
+        def write(batch:dict, computed:list) -> None:
+            t = time.perf_counter()
+            vectors = batch["vectors"]
+            for i, v in zip(batch["missing"], computed):
+                vectors[i] = [float(x) for x in v]
+            if cached and computed:
+                self.embedingFunction.store(toEmbed(batch), computed)
+            self.store.upsert(
+                ids=batch["ids"],
+                documents=batch["texts"],
+                embeddings=vectors,
+                metadatas=batch["metas"],
+                )
+            self._indexed(batch["ids"], batch["texts"], batch["metas"])
+            stats["write_s"] += time.perf_counter() - t
+            stats["docs"] += len(batch["ids"])
+            stats["batches"] += 1
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pendingWrite: Future | None = None
+
+            def handOff(batch:dict, computed:list, t:float|None = None) -> None:
+                nonlocal pendingWrite
+                if t is not None:
+                    stats["embed_s"] += time.perf_counter() - t
+                if pendingWrite is not None:
+                    pendingWrite.result()  # at most one write in flight
+                pendingWrite = writer.submit(write, batch, computed)
+
+            if workers > 1:
+                # batches embed in parallel, so embed_s is the wall-clock time during
+                # which at least one batch was embedding, not the sum over workers
+                spans:list[list[float]] = []
+
+                def track(future:Future) -> Future:
+                    span = [time.perf_counter(), 0.0]
+                    spans.append(span)
+                    future.add_done_callback(lambda _: span.__setitem__(1, time.perf_counter()))
+                    return future
+
+                with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(self.model.model_name, self.api_key, self.embeddingServer)) as pool:
+                    inFlight: deque[tuple[dict, Future]] = deque()
+                    for batch in batches():
+                        inFlight.append((batch, track(pool.submit(_embedInWorker, toEmbed(batch)))))
+                        if len(inFlight) >= workers * 2:
+                            batch, future = inFlight.popleft()
+                            handOff(batch, future.result())
+                    while inFlight:
+                        batch, future = inFlight.popleft()
+                        handOff(batch, future.result())
+                covered = 0.0
+                for begin, end in sorted(spans):
+                    covered = max(covered, begin)
+                    stats["embed_s"] += max(0.0, end - covered)
+                    covered = max(covered, end)
+            else:
+                for batch in batches():
+                    t = time.perf_counter()
+                    missing = toEmbed(batch)
+                    handOff(batch, embedLocal(missing) if missing else [], t)
+            if pendingWrite is not None:
+                pendingWrite.result()
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["docs/s"] = stats["docs"] / stats["seconds"] if stats["seconds"] else 0.0
+        if self.verbose:
+            print(f"[green]added {stats['docs']} docs ({stats['skipped']} already stored, {stats['cached']} cached) in {stats['seconds']:.2f}s ({stats['docs/s']:.1f} docs/s, embed {stats['embed_s']:.2f}s, write {stats['write_s']:.2f}s)")
+        return stats
+
+    def deleteSource(self, source:str) -> None:
+        """
+        Removes every chunk whose metadata `source` matches.
+        """
+        self.store.delete(where={"source": source})
+        if self._lexicon is not None:
+            self._lexicon.removeWhere({"source": source})
+        self.queryResults.clear()
+
+    def deleteMessages(self, session:str, start:int = 0) -> None:
+        """
+        Removes the indexed messages of `session` at position `start` and after.
+        """
+        where = {"$and": [{"session": session}, {"msg": {"$gte": start}}]}
+        self.store.delete(where=where)
+        if self._lexicon is not None:
+            self._lexicon.removeWhere(where)
+        self.queryResults.clear()
+
+    def embedQueries(self, query_texts:list[str]) -> list[list[float]]:
+        """
+        Embeds query texts through the query LRU; all misses go to the model in one call.
+        """
+        vectors = [self.queryEmbeddings.get(text) for text in query_texts]
+        missing = list(dict.fromkeys(text for text, v in zip(query_texts, vectors) if v is None))
+        if missing:
+            # fill from the model output itself: the LRU may already have evicted
+            # some of them (maxsize 0, or more misses than it holds)
+            computed = {text: [float(x) for x in vector] for text, vector in zip(missing, self.embedingFunction(missing))}
+            for text, vector in computed.items():
+                self.queryEmbeddings.put(text, vector)
+            vectors = [v if v is not None else computed[text] for text, v in zip(query_texts, vectors)]
+        return vectors
+
+    def _ranked(self, ranked:list[tuple[str, float]]) -> dict[str, list]:
+        index = self.lexicon
+        return {
+            "ids": [id_ for id_, _ in ranked],
+            "documents": [index.documents[id_] for id_, _ in ranked],
+            "metadatas": [index.metadatas[id_] for id_, _ in ranked],
+            "distances": [-score for _, score in ranked],
+        }
+
+    def search(self, query_texts:list[str], n_results:int = 5, mode:str = "vector") -> list[dict[str, list]]:
+        """
+        Raw results for each query: ids, documents, metadatas and distances.
+        Repeated (query, n_results, mode) triples are answered from an LRU until the next write.
+
+        Parameters
+        ----------
+        query_texts : list[str]
+            The queries
+        n_results : int, optional
+            Results per query, by default 5
+        mode : str, optional
+            "vector" (embedding similarity), "lexical" (BM25, never embeds) or
+            "hybrid" (reciprocal rank fusion of both), by default "vector".
+            For lexical and hybrid results `distances` holds the negated score.
+        """
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"Unknown mode {mode!r}, use 'vector', 'lexical' or 'hybrid'")
+        results:list = [self.queryResults.get((text, n_results, mode)) for text in query_texts]
+        todo = [i for i, r in enumerate(results) if r is None]
+        if not todo:
+            return results
+        texts = [query_texts[i] for i in todo]
+        if mode == "lexical":
+            with tracer.span("lexical.query", n=len(texts), k=n_results):
+                fresh = [self._ranked(self.lexicon.search(text, n_results)) for text in texts]
+        else:
+            fetch = n_results if mode == "vector" else max(n_results * 4, 20)
+            with tracer.span("vector.query", n=len(texts), k=fetch):
+                raw = self.store.query(self.embedQueries(texts), n_results=fetch)
+            fresh = [{key: raw[key][j] for key in ("ids", "documents", "metadatas", "distances")} for j in range(len(texts))]
+            if mode == "hybrid":
+                with tracer.span("lexical.query", n=len(texts), k=fetch):
+                    fresh = [
+                        self._ranked(rrf([r["ids"], [id_ for id_, _ in self.lexicon.search(text, fetch)]])[:n_results])
+                        for text, r in zip(texts, fresh)
+                    ]
+        for i, result in zip(todo, fresh):
+            results[i] = result
+            self.queryResults.put((query_texts[i], n_results, mode), result)
+        return results
 
     @TimeIt
-    def query(self, query_texts:list[str] ,n_results:int = 5)->list[dict[str, str]]:
-        results = self.collection.query(
-            query_texts=query_texts,
-            n_results=n_results
-        )["documents"]
-        conv = self.doc_to_conversation(results[0])
+    def query(self, query_texts:str|list[str] ,n_results:int = 5, mode:str = "vector")->list[dict[str, str]]|list[list[dict[str, str]]]:
+        """
+        Retrieves the best matching documents as conversation messages.
 
-        return conv
+        A single string returns one message list; a list of strings is embedded in
+        one batch and returns one message list per query. `mode` is "vector",
+        "lexical" or "hybrid", see `search`.
+        """
+        if isinstance(query_texts, str):
+            return self.doc_to_conversation(self.search([query_texts], n_results, mode)[0]["documents"])
+        return [self.doc_to_conversation(r["documents"]) for r in self.search(query_texts, n_results, mode)]
 
     def doc_to_conversation(self, docs:list[str]) -> list[dict[str, str]]:
         conversations:list[dict[str, str]] = []
@@ -102,20 +443,96 @@ class Db:
             conversations.append({"role": role, "content": content})
         return conversations
 
-    def conversation_to_doc(self, conversations:list[dict[str, str]], add:bool = False) -> list[str]:
+    def messageDoc(self, inx:int, msg:dict[str, str]) -> str|None:
+        tag = {"user": "USER", "assistant": "ASSISTANT", "system": "SYSTEM"}.get(msg["role"])
+        return f'[{tag}_MSG_ID_{inx}] {msg["content"]}' if tag else None
+
+    def conversation_to_doc(self, conversations:list[dict[str, str]], add:bool = False, session:str = "default") -> list[str]:
         docs = []
         for inx, msg  in enumerate(conversations):
-
-            if msg["role"] == "user":
-                docs.append(f'[USER_MSG_ID_{inx}] {msg["content"]}')
-            elif msg["role"] == "assistant":
-                docs.append(f'[ASSISTANT_MSG_ID_{inx}] {msg["content"]}')
-            elif msg["role"] == "system":
-                docs.append(f'[SYSTEM_MSG_ID_{inx}] {msg["content"]}')
+            doc = self.messageDoc(inx, msg)
+            if doc is not None:
+                docs.append(doc)
         if add:
-            self.add(docs=docs)
+            self.indexConversation(conversations, session)
         return docs
 
+    def messageId(self, session:str, inx:int, msg:dict[str, str]) -> str:
+        return textKey(f"{session}\0{inx}\0{msg['role']}\0{msg['content']}", self.model.model_name)
+
+    def _saveWatermarks(self) -> None:
+        if not self.watermarksPath:
+            return
+        os.makedirs(os.path.dirname(self.watermarksPath) or ".", exist_ok=True)
+        tmp = self.watermarksPath + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({session: [n, self.lastIndexed.get(session, "")] for session, n in self.watermarks.items()}, f)
+        os.replace(tmp, self.watermarksPath)
+
+    def indexConversation(self, conversations:list[dict[str, str]], session:str = "default") -> int:
+        """
+        Indexes the messages of `session` added since the last call and returns
+        how many were embedded.
+
+        The session's watermark (number of messages already indexed) is persisted
+        next to a persistent collection, and message IDs are derived from
+        (session, position, role, content), so calling this every turn, or again
+        after a restart, never re-embeds or duplicates a message. The ID of the
+        last indexed message is kept with the watermark: if the history is shorter
+        than the watermark or holds a different message there (rolled back and
+        grown again), it is re-checked from the start. The entries after the
+        prefix still stored are deleted, so discarded messages are no longer
+        recalled, and only the messages after that prefix are embedded.
+        """
+        start = self.watermarks.get(session, 0)
+        rolledBack = start > len(conversations) or bool(start and self.messageId(session, start - 1, conversations[start - 1]) != self.lastIndexed.get(session))
+        if rolledBack:
+            start = 0
+        docs, metas, ids = [], [], []
+        for inx in range(start, len(conversations)):
+            msg = conversations[inx]
+            doc = self.messageDoc(inx, msg)
+            if doc is None:
+                continue
+            docs.append(doc)
+            metas.append({"session": session, "msg": inx, "role": msg["role"]})
+            ids.append(self.messageId(session, inx, msg))
+        existing = self.store.existing(ids) if ids else set()
+        if rolledBack:
+            # the first message not stored ends the prefix shared with the indexed history
+            prefix = next((metas[i]["msg"] for i, id_ in enumerate(ids) if id_ not in existing), len(conversations))
+            self.deleteMessages(session, prefix)
+            keep = [i for i, meta in enumerate(metas) if meta["msg"] >= prefix]
+        else:
+            keep = [i for i, id_ in enumerate(ids) if id_ not in existing]
+        if keep:
+            self.add(docs=[docs[i] for i in keep], metadatas=[metas[i] for i in keep], ids=[ids[i] for i in keep])
+        last = self.messageId(session, len(conversations) - 1, conversations[-1]) if conversations else ""
+        if self.watermarks.get(session) != len(conversations) or self.lastIndexed.get(session) != last:
+            self.watermarks[session] = len(conversations)
+            self.lastIndexed[session] = last
+            self._saveWatermarks()
+        return len(keep)
+
+    def recall(self, query_text:str, session:str = "default", liveWindow:int = 20, n_results:int = 5, mode:str = "vector") -> list[dict[str, str]]:
+        """
+        Like `query`, but leaves out the last `liveWindow` indexed messages of
+        `session`, which are still in the model's context anyway. Over-fetches
+        and filters on the message metadata until `n_results` are found.
+        """
+        cutoff = self.watermarks.get(session, 0) - liveWindow
+        total = self.store.count()
+        fetch = n_results + liveWindow
+        while True:
+            result = self.search([query_text], min(fetch, max(total, 1)), mode)[0]
+            docs = [
+                doc for doc, meta in zip(result["documents"], result["metadatas"])
+                if not (meta and meta.get("session") == session and meta.get("msg", -1) >= cutoff)
+            ]
+            if len(docs) >= n_results or fetch >= total:
+                return self.doc_to_conversation(docs[:n_results])
+            fetch *= 2
+
     def convos_to_doc(self, query_texts:list[str], metadatas:list[dict[str, str]]) -> list[str]:
         querys = []
         metas = []
@@ -124,27 +541,53 @@ class Db:
             metas.append({"data": json.dumps(meta["data"])})
         self.add(docs=querys, metadatas=metas)
     
-    def pdf_to_doc(self, pdf_path:str, add:bool = False) -> list[str]:
+    def iterPdf(self, pdf_path:str, workers:int|None = None, pagesPerTask:int = 16) -> Iterator[tuple[str, dict]]:
+        """
+        Yields `([DOC_<name>_MSG_ID_<n>] chunk, metadata)` page by page, without ever
+        holding the whole document's text. Pages are extracted and split in a
+        process pool for large files (`workers=None` picks one automatically),
+        at most two tasks per worker ahead of the consumer.
+        """
         import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as pdf:
+            pages = len(pdf)
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8) if pages >= 100 else 1
+        pdfName = os.path.splitext(os.path.basename(pdf_path.replace("\\", "/")))[0]
+        size, overlap = self.chunk_size, self.chunk_overlap
+        ranges = [(start, min(start + pagesPerTask, pages)) for start in range(0, pages, pagesPerTask)]
 
-        # Open the PDF file
-        pdf_document = pdf_path
-        pdf = fitz.open(pdf_document)
-
-        # Extract text from each page
-        text = ""
-        for page_num in range(len(pdf)):
-            page = pdf.load_page(page_num)
-            text += page.get_text()
-        doc:list[str] = self.text_splitter.split_text(text)
-        newDocs = []
-        pdfName = pdf_path.split("\\")[-1].split(".")[0]
-        for inx, msg  in enumerate(doc):
-            newDocs.append(f'[DOC_{pdfName}_MSG_ID_{inx}] {msg}')
-        
-        if add:
-            self.add(docs=newDocs)
+        def results() -> Iterator[list[tuple[int, list[str]]]]:
+            if workers <= 1:
+                for start, stop in ranges:
+                    yield _pdfChunks(pdf_path, start, stop, size, overlap)
+                return
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                inFlight:deque[Future] = deque()
+                for start, stop in ranges:
+                    inFlight.append(pool.submit(_pdfChunks, pdf_path, start, stop, size, overlap))
+                    if len(inFlight) >= workers * 2:
+                        yield inFlight.popleft().result()
+                while inFlight:
+                    yield inFlight.popleft().result()
+
+        inx = 0
+        for result in results():
+            for page_num, chunks in result:
+                for chunk in chunks:
+                    yield f'[DOC_{pdfName}_MSG_ID_{inx}] {chunk}', {"source": pdfName, "page": page_num + 1, "chunk": inx}
+                    inx += 1
 
-        return newDocs
+    def addPdf(self, pdf_path:str, batchSize:int = 64, workers:int|None = None) -> dict[str, float]:
+        """
+        Streams a PDF straight into `addStream`; memory stays flat regardless of
+        the document size.
+        """
+        return self.addStream(self.iterPdf(pdf_path, workers=workers), batchSize=batchSize)
 
+    def pdf_to_doc(self, pdf_path:str, add:bool = False) -> list[str]:
+        chunks = list(self.iterPdf(pdf_path))
+        if add:
+            self.addStream(chunks)
+        return [doc for doc, _ in chunks]
 
@@ -0,0 +1,215 @@
+"""
+Benchmarks the catalogued embedding models on our own documents and queries.
+
+    python -m plugins.codebrew.db.benchmarkCls ./manuals queries.jsonl --target-recall 0.8
+
+`queries.jsonl` has one `{"query": "...", "relevant": ["file.pdf", ...]}` per line,
+where `relevant` lists the corpus files (relative to the corpus root) that answer
+the query. Each model runs in a fresh process so its load time and peak RSS are
+not skewed by the models before it. Results are written to `--output`, by
+default `embedding_benchmarks.json` in the working directory (see
+`embeddingCls.MEASURED_PATH`), and shown by `ShowAllModels`.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from rich.table import Table
+from rich import print
+import multiprocessing
+import time
+import json
+import sys
+import os
+import numpy as np
+
+try:from db.embeddingCls import Model, models, saveMeasured, recommend, MEASURED_PATH
+except ImportError:from plugins.codebrew.db.embeddingCls import Model, models, saveMeasured, recommend, MEASURED_PATH
+try:from db.ingestCls import EXTENSIONS, _extract
+except ImportError:from plugins.codebrew.db.ingestCls import EXTENSIONS, _extract
+
+BATCH_SIZES = (1, 8, 32, 128)
+
+def peakRssMB() -> float|None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1 << 20)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+def loadCorpus(root:str, chunk_size:int = 800, chunk_overlap:int = 150) -> tuple[list[str], list[str]]:
+    """
+    Chunks every supported file under `root` the same way `Ingestor` does.
+    Returns the chunks and the source file of each chunk.
+    """
+    docs, sources = [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, filename)
+            source = os.path.relpath(path, root).replace("\\", "/")
+            for doc, meta in _extract(path, source, chunk_size, chunk_overlap)[1]:
+                docs.append(doc)
+                sources.append(meta["source"])
+    return docs, sources
+
+def loadQueries(path:str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _embed(ef, texts:list[str], batchSize:int) -> np.ndarray:
+    vectors = []
+    for i in range(0, len(texts), batchSize):
+        vectors.extend(ef(texts[i:i + batchSize]))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def recallAtK(docVectors:np.ndarray, sources:list[str], queryVectors:np.ndarray, queries:list[dict], k:int) -> float:
+    """
+    Mean fraction of each query's relevant files found among its top-k chunks.
+    """
+    scores = queryVectors @ docVectors.T
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    recalls = []
+    for row, query in zip(top, queries):
+        relevant = set(query["relevant"])
+        if relevant:
+            recalls.append(len(relevant & {sources[i] for i in row}) / len(relevant))
+    return float(np.mean(recalls)) if recalls else 0.0
+
+def _benchModel(model_name:str, docs:list[str], sources:list[str], queries:list[dict], batchSizes:tuple[int, ...], k:int, maxDocs:int) -> dict:
+    """Runs in a fresh process."""
+    try:from db.DbCls import embeddingFunction
+    except ImportError:from plugins.codebrew.db.DbCls import embeddingFunction
+    start = time.perf_counter()
+    ef = embeddingFunction(model_name)
+    ef(["warm up"])
+    load_s = time.perf_counter() - start
+
+    sample = docs[:maxDocs]
+    throughput = {}
+    for batchSize in batchSizes:
+        start = time.perf_counter()
+        _embed(ef, sample, batchSize)
+        throughput[batchSize] = len(sample) / (time.perf_counter() - start)
+    best = max(throughput, key=throughput.get)
+
+    docVectors = _embed(ef, docs, best)
+    queryVectors = _embed(ef, [q["query"] for q in queries], best)
+    return {
+        "load_s": load_s,
+        "throughput": {str(b): r for b, r in throughput.items()},
+        "batch": best,
+        "docs_per_s": throughput[best],
+        "peak_rss_mb": peakRssMB(),
+        "recall": recallAtK(docVectors, sources, queryVectors, queries, k),
+        "k": k,
+        "docs": len(docs),
+        "queries": len(queries),
+        "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def benchmark(
+        corpus:str,
+        queries:str,
+        candidates:list[Model] = models,
+        batchSizes:tuple[int, ...] = BATCH_SIZES,
+        k:int = 5,
+        maxDocs:int = 512,
+        save:bool = True,
+        verbose:bool = True,
+        output:str = MEASURED_PATH,
+        ) -> dict[str, dict]:
+    """
+    Measures every model in `candidates` and stores the numbers on `Model.measured`.
+
+    Parameters
+    ----------
+    corpus : str
+        Directory of documents, chunked like `Ingestor` does
+    queries : str
+        JSONL file of {"query", "relevant"} records
+    candidates : list[Model], optional
+        Models to measure, by default the whole catalogue
+    batchSizes : tuple[int, ...], optional
+        Batch sizes to measure throughput at, by default (1, 8, 32, 128)
+    k : int, optional
+        Cut-off for recall@k, by default 5
+    maxDocs : int, optional
+        Number of chunks used for the throughput runs, by default 512
+    save : bool, optional
+        Write the results to `output`, by default True
+    output : str, optional
+        JSON file the results are merged into, by default `MEASURED_PATH`
+        (relative to the working directory)
+
+    Returns
+    -------
+    dict[str, dict]
+        Measurements by model name; models that failed to load are reported and left out.
+    """
+    docs, sources = loadCorpus(corpus)
+    labelled = loadQueries(queries)
+    if not docs or not labelled:
+        raise ValueError("Need at least one document and one query")
+    results = {}
+    spawn = multiprocessing.get_context("spawn")
+    for model in candidates:
+        if verbose:
+            print(f"[cyan]Benchmarking {model.model_name}[/cyan] on {len(docs)} chunks, {len(labelled)} queries")
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            try:
+                model.measured = pool.submit(_benchModel, model.model_name, docs, sources, labelled, tuple(batchSizes), k, maxDocs).result()
+            except Exception as e:
+                print(f"[red]{model.model_name} failed: {e}[/red]")
+                continue
+        results[model.model_name] = model.measured
+        if save:
+            saveMeasured(output)  # after every model, so an interrupted run keeps what it measured
+    if verbose:
+        showResults(results, batchSizes)
+    return results
+
+def showResults(results:dict[str, dict], batchSizes:tuple[int, ...] = BATCH_SIZES) -> None:
+    table = Table(title="Measured Embedding Models")
+    table.add_column("Model Name", justify="left", style="cyan", no_wrap=True)
+    table.add_column("Load (s)", justify="right", style="yellow")
+    for batchSize in batchSizes:
+        table.add_column(f"Docs/s @{batchSize}", justify="right", style="green")
+    table.add_column("Peak RSS (MB)", justify="right", style="yellow")
+    table.add_column("Recall@k", justify="right", style="magenta")
+    for name, m in sorted(results.items(), key=lambda item: -item[1]["docs_per_s"]):
+        table.add_row(
+            name,
+            f"{m['load_s']:.2f}",
+            *(f"{m['throughput'].get(str(b), 0):.0f}" for b in batchSizes),
+            f"{m['peak_rss_mb']:.0f}" if m["peak_rss_mb"] is not None else "-",
+            f"{m['recall']:.3f}",
+        )
+    print(table)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the embedding model catalogue on your own corpus")
+    parser.add_argument("corpus", help="directory of documents")
+    parser.add_argument("queries", help="JSONL of {\"query\", \"relevant\": [files]}")
+    parser.add_argument("--models", nargs="*", default=None, help="model names, by default all")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=list(BATCH_SIZES))
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--max-docs", type=int, default=512)
+    parser.add_argument("--target-recall", type=float, default=0.8)
+    parser.add_argument("--output", default=MEASURED_PATH, help="results file, merged with earlier runs")
+    args = parser.parse_args()
+    candidates = [m for m in models if args.models is None or m.model_name in args.models]
+    benchmark(args.corpus, args.queries, candidates, tuple(args.batch_sizes), args.k, args.max_docs, output=args.output)
+    best = recommend(args.target_recall)
+    if best is None:
+        print(f"[red]No measured model reaches recall@{args.k} >= {args.target_recall}[/red]")
+    else:
+        print(f"[green]Recommended:[/green] {best.model_name} ({best.measured['docs_per_s']:.0f} docs/s at batch {best.measured['batch']}, recall@{best.measured['k']} {best.measured['recall']:.3f})")
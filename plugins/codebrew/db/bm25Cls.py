@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+from typing import Iterable
+import threading
+import heapq
+import math
+import re
+
+try:from db.storeCls import matches
+except ImportError:from plugins.codebrew.db.storeCls import matches
+
+# identifiers (foo_bar, FooBar), dotted parts and numbers; punctuation is dropped
+TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def tokenize(text:str) -> list[str]:
+    """
+    Lower-cased identifier tokens. Compound identifiers are kept whole and also
+    split into their snake_case / camelCase parts, so `addStream` matches both
+    "addStream" and "stream".
+
+    Examples
+    --------
+    >>> tokenize("KeyError in Db.addStream")
+    ['keyerror', 'key', 'error', 'in', 'db', 'addstream', 'add', 'stream']
+    """
+    tokens = []
+    for word in TOKEN.findall(text):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = [p.lower() for piece in word.split("_") for p in CAMEL.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index, updated incrementally.
+
+    Examples
+    --------
+    >>> index = BM25Index()
+    >>> index.add(["a", "b"], ["def run(prompt)", "def add(docs)"])
+    >>> index.search("run", 1)
+    [('a', 0.98...)]
+    """
+    def __init__(self, k1:float = 1.5, b:float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings:dict[str, dict[str, int]] = defaultdict(dict)
+        self.lengths:dict[str, int] = {}
+        self.documents:dict[str, str] = {}
+        self.metadatas:dict[str, dict|None] = {}
+        self.totalLength = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, ids:list[str], documents:list[str], metadatas:list[dict|None]|None = None) -> None:
+        """Adds or replaces documents."""
+        metadatas = metadatas or [None] * len(ids)
+        with self.lock:
+            for id_, doc, meta in zip(ids, documents, metadatas):
+                if id_ in self.lengths:
+                    self._remove(id_)
+                terms = Counter(tokenize(doc))
+                for term, tf in terms.items():
+                    self.postings[term][id_] = tf
+                length = sum(terms.values())
+                self.lengths[id_] = length
+                self.totalLength += length
+                self.documents[id_] = doc
+                self.metadatas[id_] = meta
+
+    def _remove(self, id_:str) -> None:
+        for term in set(tokenize(self.documents[id_])):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(id_, None)
+                if not posting:
+                    del self.postings[term]
+        self.totalLength -= self.lengths.pop(id_)
+        del self.documents[id_]
+        del self.metadatas[id_]
+
+    def remove(self, ids:Iterable[str]) -> None:
+        with self.lock:
+            for id_ in ids:
+                if id_ in self.lengths:
+                    self._remove(id_)
+
+    def removeWhere(self, where:dict) -> None:
+        """Removes documents whose metadata matches a chroma-style `where` filter."""
+        self.remove([id_ for id_, meta in list(self.metadatas.items()) if matches(meta, where)])
+
+    def search(self, query:str, n_results:int = 5) -> list[tuple[str, float]]:
+        """
+        Returns up to `n_results` (id, score) pairs, best first. Only documents
+        sharing at least one term with the query are scored.
+        """
+        with self.lock:
+            n = len(self.lengths)
+            if not n:
+                return []
+            avg = self.totalLength / n
+            scores:dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for id_, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[id_] / avg)
+                    scores[id_] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+def rrf(rankings:list[list[str]], k:int = 60) -> list[tuple[str, float]]:
+    """
+    Reciprocal rank fusion of several ranked id lists, best first.
+    """
+    scores:dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking):
+            scores[id_] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from array import array
+import threading
+import hashlib
+import sqlite3
+import os
+
+def textKey(text:str, model_name:str) -> str:
+    """
+    Deterministic key for a text embedded by a given model. Also used as the
+    document ID, so re-adding the same text with the same model is a no-op.
+    """
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+class EmbeddingCache:
+    """
+    Persistent float32 embedding cache in SQLite, keyed by `textKey`.
+
+    Examples
+    --------
+    >>> cache = EmbeddingCache(".embeddings.sqlite")
+    >>> cache.put({"k": [0.1, 0.2]})
+    >>> cache.get(["k"])
+    {'k': [0.10000000149011612, 0.20000000298023224]}
+    """
+    def __init__(self, path:str = ".embeddings.sqlite") -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+
+    def get(self, keys:list[str]) -> dict[str, list[float]]:
+        found:dict[str, list[float]] = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):  # stay under sqlite's variable limit
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put(self, items:dict[str, list[float]]) -> None:
+        if not items:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(key, array("f", vec).tobytes()) for key, vec in items.items()],
+            )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+class CachedEmbeddingFunction:
+    """
+    Wraps a chromadb embedding function so already-seen texts are served from an
+    `EmbeddingCache` and only the misses reach the model, in a single call.
+    """
+    def __init__(self, ef, model_name:str, cache:EmbeddingCache) -> None:
+        self.ef = ef
+        self.model_name = model_name
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, texts:list[str]) -> tuple[list[list[float] | None], list[int]]:
+        """
+        Returns the cached vectors (None where missing) and the indexes of the misses.
+        """
+        keys = [textKey(t, self.model_name) for t in texts]
+        found = self.cache.get(list(set(keys)))
+        vectors = [found.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return vectors, missing
+
+    def store(self, texts:list[str], vectors:list) -> None:
+        self.cache.put({textKey(t, self.model_name): [float(x) for x in v] for t, v in zip(texts, vectors)})
+
+    def __call__(self, input:list[str]) -> list[list[float]]:
+        vectors, missing = self.lookup(list(input))
+        if missing:
+            texts = [input[i] for i in missing]
+            computed = self.ef(texts)
+            self.store(texts, computed)
+            for i, v in zip(missing, computed):
+                vectors[i] = [float(x) for x in v]
+        return vectors
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping.
+
+    Examples
+    --------
+    >>> cache = LRUCache(2)
+    >>> cache.put("a", 1); cache.put("b", 2); cache.put("c", 3)
+    >>> cache.get("a") is None
+    True
+    """
+    def __init__(self, maxsize:int = 1024) -> None:
+        self.maxsize = maxsize
+        self.data:OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default = None):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self) -> int:
+        return len(self.data)
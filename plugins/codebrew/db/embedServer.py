@@ -0,0 +1,246 @@
+"""
+Shared embedding daemon over a Unix socket.
+
+    python -m plugins.codebrew.db.embedServer --socket /tmp/codebrew-embed.sock --preload all-mpnet-base-v2
+
+Each model is loaded once, however many agent processes use it. Requests from
+concurrent clients are merged into micro-batches: a batch is run as soon as it
+holds `maxBatch` texts or `maxDelay` seconds after its first request arrived.
+
+Wire format: every message is a 4-byte big-endian length followed by the payload.
+A request is one JSON frame `{"model": name, "texts": [...]}`; the reply is a JSON
+frame `{"n": rows, "dim": dim}` (or `{"error": message}`) followed by a frame of
+rows * dim little-endian float32 values.
+
+Point `Db` at the daemon with `Db(embeddingServer=path)` or the
+CODEBREW_EMBED_SOCKET environment variable.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from rich import print
+import threading
+import asyncio
+import socket
+import struct
+import json
+import time
+import os
+import numpy as np
+
+HEADER = struct.Struct(">I")
+DEFAULT_SOCKET = "/tmp/codebrew-embed.sock"
+
+def _recvExact(sock:socket.socket, size:int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if not n:
+            raise ConnectionError("embedding server closed the connection")
+        view = view[n:]
+        size -= n
+    return bytes(buf)
+
+def _recvFrame(sock:socket.socket) -> bytes:
+    return _recvExact(sock, HEADER.unpack(_recvExact(sock, HEADER.size))[0])
+
+def _frame(payload:bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+class RemoteEmbeddingFunction:
+    """
+    Drop-in replacement for a chromadb embedding function that asks the daemon.
+    Each thread keeps its own connection, opened on first use.
+
+    Examples
+    --------
+    >>> ef = RemoteEmbeddingFunction("all-mpnet-base-v2")
+    >>> len(ef(["hello"])[0])
+    768
+    """
+    def __init__(self, model_name:str, path:str = DEFAULT_SOCKET, timeout:float = 120.0) -> None:
+        self.model_name = model_name
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = getattr(self.local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self.local.sock = sock
+        return sock
+
+    def close(self) -> None:
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
+
+    def embed(self, texts:list[str]) -> np.ndarray:
+        request = _frame(json.dumps({"model": self.model_name, "texts": list(texts)}).encode("utf-8"))
+        for attempt in range(2):  # reconnect once if the daemon was restarted
+            try:
+                sock = self._connect()
+                sock.sendall(request)
+                header = json.loads(_recvFrame(sock))
+                if "error" in header:
+                    raise RuntimeError(f"embedding server: {header['error']}")
+                return np.frombuffer(_recvFrame(sock), dtype="<f4").reshape(header["n"], header["dim"])
+            except (ConnectionError, BrokenPipeError, FileNotFoundError):
+                self.close()
+                if attempt:
+                    raise
+            except BaseException:
+                # a timeout or error may leave half a reply on the socket; never reuse it
+                self.close()
+                raise
+        raise AssertionError("unreachable")
+
+    def __call__(self, input:list[str]) -> list[list[float]]:
+        if not input:
+            return []
+        return self.embed(input).tolist()
+
+class Batcher:
+    """Collects requests for one model and runs them as micro-batches on a single thread."""
+    def __init__(self, ef, maxBatch:int, maxDelay:float) -> None:
+        self.ef = ef
+        self.maxBatch = maxBatch
+        self.maxDelay = maxDelay
+        self.queue:asyncio.Queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.texts = 0
+        self.task = asyncio.get_running_loop().create_task(self.loop())
+
+    async def embed(self, texts:list[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.maxDelay
+            while size < self.maxBatch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            texts = [t for item, _ in pending for t in item]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self._run, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for item, future in pending:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item)])
+                offset += len(item)
+
+    def _run(self, texts:list[str]) -> np.ndarray:
+        return np.asarray(self.ef(texts), dtype="<f4")
+
+class EmbedServer:
+    def __init__(self, path:str = DEFAULT_SOCKET, maxBatch:int = 64, maxDelay:float = 0.005, efFactory = None) -> None:
+        """
+        Parameters
+        ----------
+        path : str, optional
+            Unix socket path, by default /tmp/codebrew-embed.sock
+        maxBatch : int, optional
+            Texts per model call, by default 64
+        maxDelay : float, optional
+            Longest a request waits for others to join its batch, in seconds, by default 0.005
+        efFactory : optional
+            `model_name -> embedding function`, by default `DbCls.embeddingFunction`
+        """
+        if efFactory is None:
+            try:from db.DbCls import embeddingFunction
+            except ImportError:from plugins.codebrew.db.DbCls import embeddingFunction
+            efFactory = embeddingFunction
+        self.path = path
+        self.maxBatch = maxBatch
+        self.maxDelay = maxDelay
+        self.efFactory = efFactory
+        self.batchers:dict[str, Batcher] = {}
+        self.loading:dict[str, asyncio.Future] = {}
+
+    async def _load(self, model_name:str) -> None:
+        start = time.perf_counter()
+        try:
+            ef = await asyncio.to_thread(self.efFactory, model_name)
+            self.batchers[model_name] = Batcher(ef, self.maxBatch, self.maxDelay)
+        finally:
+            del self.loading[model_name]
+        print(f"[green]loaded {model_name} in {time.perf_counter() - start:.2f}s")
+
+    async def batcher(self, model_name:str) -> Batcher:
+        if model_name not in self.batchers:
+            if model_name not in self.loading:  # concurrent first requests share one load
+                self.loading[model_name] = asyncio.ensure_future(self._load(model_name))
+            await asyncio.shield(self.loading[model_name])
+        return self.batchers[model_name]
+
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    size = HEADER.unpack(await reader.readexactly(HEADER.size))[0]
+                    request = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    return
+                try:
+                    batcher = await self.batcher(request["model"])
+                    vectors = await batcher.embed(request["texts"]) if request["texts"] else np.zeros((0, 0), "<f4")
+                except Exception as e:
+                    writer.write(_frame(json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")))
+                    await writer.drain()
+                    continue
+                n, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+                writer.write(_frame(json.dumps({"n": n, "dim": dim}).encode("utf-8")))
+                writer.write(_frame(np.ascontiguousarray(vectors, dtype="<f4").tobytes()))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, preload:list[str] = ()) -> None:
+        for model_name in preload:
+            await self.batcher(model_name)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        print(f"[cyan]embedding server on {self.path} (batch {self.maxBatch}, deadline {self.maxDelay * 1000:.1f}ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shared embedding server for CodeBrew Db instances")
+    parser.add_argument("--socket", default=os.getenv("CODEBREW_EMBED_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    parser.add_argument("--preload", nargs="*", default=[], help="models to load at startup")
+    args = parser.parse_args()
+    try:
+        asyncio.run(EmbedServer(args.socket, args.max_batch, args.max_delay_ms / 1000).serve(args.preload))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,11 @@
 from rich import print
 from rich.table import Table
+import json
+import os
+
+# numbers measured by benchmarkCls on our own hardware and corpus, in the working
+# directory rather than the package so a run does not dirty the source tree
+MEASURED_PATH = "embedding_benchmarks.json"
 
 class Model:
     def __init__(self,
@@ -15,6 +21,7 @@ class Model:
         self.avg_Peformance = avg_Peformance
         self.speed = speed
         self.model_Size_MB = model_Size_MB
+        self.measured:dict|None = None
 
     def __repr__(self) -> str:
         return f"Model(Name: {self.model_name}, Peformance_Sentence_Embedding: {self.peformance_Sentence_Embedding}, Peformance_Semantic_Search: {self.peformance_Semantic_Search}, Avg_Peformance: {self.avg_Peformance}, Speed: {self.speed}, Model_Size_MB: {self.model_Size_MB})"
@@ -50,7 +57,42 @@ models = [
     distiluse_base_multilingual_cased_v2
 ]
 
-def ShowAllModels():
+def getModel(model_name:str) -> Model:
+    for model in models:
+        if model.model_name == model_name:
+            return model
+    raise KeyError(f"Unknown model: {model_name}")
+
+def loadMeasured(path:str = MEASURED_PATH) -> None:
+    """
+    Attaches the benchmark results saved at `path` to the catalogued models.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        measured = json.load(f)
+    for model in models:
+        model.measured = measured.get(model.model_name, model.measured)
+
+def saveMeasured(path:str = MEASURED_PATH) -> None:
+    measured = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            measured = json.load(f)
+    measured.update({model.model_name: model.measured for model in models if model.measured})
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(measured, f, indent=2)
+    os.replace(tmp, path)
+
+def recommend(target_recall:float) -> Model|None:
+    """
+    The model with the highest measured throughput whose recall@k meets `target_recall`.
+    """
+    ok = [m for m in models if m.measured and m.measured["recall"] >= target_recall]
+    return max(ok, key=lambda m: m.measured["docs_per_s"], default=None)
+
+def ShowAllModels(measuredPath:str = MEASURED_PATH):
     table = Table(title="Model Performance Comparison")
 
     table.add_column("Model Name", justify="left", style="cyan", no_wrap=True)
@@ -59,16 +101,30 @@ def ShowAllModels():
     table.add_column("Avg Performance", justify="right", style="magenta")
     table.add_column("Speed", justify="right", style="green")
     table.add_column("Model Size (MB)", justify="right", style="yellow")
+    loadMeasured(measuredPath)
+    if any(model.measured for model in models):
+        table.add_column("Load (s)", justify="right", style="blue")
+        table.add_column("Docs/s", justify="right", style="blue")
+        table.add_column("Peak RSS (MB)", justify="right", style="blue")
+        table.add_column("Recall@k", justify="right", style="blue")
 
     for model in models:
-        table.add_row(
+        row = [
             model.model_name,
             f"{model.peformance_Sentence_Embedding:.2f}",
             f"{model.peformance_Semantic_Search:.2f}",
             f"{model.avg_Peformance:.2f}",
             f"{model.speed:.2f}",
             f"{model.model_Size_MB:.2f}"
-        )
+        ]
+        if len(table.columns) > len(row):
+            m = model.measured
+            row += [
+                f"{m['load_s']:.2f}", f"{m['docs_per_s']:.0f}",
+                f"{m['peak_rss_mb']:.0f}" if m["peak_rss_mb"] is not None else "-",
+                f"{m['recall']:.3f}",
+            ] if m else ["-"] * 4
+        table.add_row(*row)
 
     print(table)
 if __name__=="__main__":
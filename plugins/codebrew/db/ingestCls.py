@@ -0,0 +1,204 @@
+"""
+Resumable bulk ingestion of a directory tree into `Db`.
+
+    python -m plugins.codebrew.db.ingestCls ./manuals --name my_db
+
+Unchanged files (same size and mtime, or same sha256) are skipped. Extraction
+and splitting run in a process pool while the main process embeds and writes.
+After each file is stored it is recorded in a checkpoint file, so an
+interrupted run resumes with the next file. A file that fails (e.g. a corrupt
+PDF) is reported and recorded with its error, and the run goes on; it is not
+retried until it changes.
+"""
+from concurrent.futures import ProcessPoolExecutor, Future
+from collections import deque, defaultdict
+from rich.table import Table
+from rich import print
+import hashlib
+import time
+import json
+import os
+
+try:from db.DbCls import Db, _pdfChunks
+except ImportError:from plugins.codebrew.db.DbCls import Db, _pdfChunks
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+EXTENSIONS = {".pdf", ".txt", ".md", ".markdown", ".rst"}
+
+def fileHash(path:str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract(path:str, source:str, chunk_size:int, chunk_overlap:int) -> tuple[str, list[tuple[str, dict]], float]:
+    """Runs in a pool worker: returns (path, [(doc, metadata)], seconds)."""
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    docs:list[tuple[str, dict]] = []
+    if path.lower().endswith(".pdf"):
+        import fitz  # PyMuPDF
+        with fitz.open(path) as pdf:
+            pages = len(pdf)
+        for page_num, chunks in _pdfChunks(path, 0, pages, chunk_size, chunk_overlap):
+            for chunk in chunks:
+                docs.append((f"[DOC_{name}_MSG_ID_{len(docs)}] {chunk}", {"source": source, "page": page_num + 1, "chunk": len(docs)}))
+    else:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, is_separator_regex=False)
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        for chunk in splitter.split_text(text):
+            docs.append((f"[DOC_{name}_MSG_ID_{len(docs)}] {chunk}", {"source": source, "chunk": len(docs)}))
+    return path, docs, time.perf_counter() - start
+
+class Ingestor:
+    def __init__(self,
+                db:Db,
+                checkpoint:str = ".ingest_checkpoint.json",
+                workers:int|None = None,
+                batchSize:int = 64,
+                extensions:set[str] = EXTENSIONS,
+                ):
+        self.db = db
+        self.checkpointPath = checkpoint
+        self.workers = workers or os.cpu_count() or 1
+        self.batchSize = batchSize
+        self.extensions = extensions
+        self.checkpoint:dict[str, dict] = {}
+        if os.path.exists(checkpoint):
+            with open(checkpoint, "r", encoding="utf-8") as f:
+                self.checkpoint = json.load(f)
+
+    def save(self) -> None:
+        tmp = self.checkpointPath + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp, self.checkpointPath)
+
+    def scan(self, root:str) -> tuple[list[tuple[str, str, dict]], int]:
+        """
+        Returns the files that need ingesting as (path, source, fingerprint) and
+        the number of unchanged files skipped.
+        """
+        todo, skipped = [], 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() not in self.extensions:
+                    continue
+                path = os.path.join(dirpath, filename)
+                source = os.path.relpath(path, root).replace("\\", "/")
+                stat = os.stat(path)
+                seen = self.checkpoint.get(source)
+                if seen and seen["size"] == stat.st_size and seen["mtime"] == stat.st_mtime:
+                    skipped += 1
+                    continue
+                digest = fileHash(path)
+                if seen and seen["sha256"] == digest:
+                    seen["mtime"] = stat.st_mtime  # touched but not changed
+                    skipped += 1
+                    continue
+                todo.append((path, source, {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}))
+        return todo, skipped
+
+    def run(self, root:str) -> dict:
+        start = time.perf_counter()
+        todo, skipped = self.scan(root)
+        byType:dict[str, dict[str, float]] = defaultdict(lambda: {"files": 0, "chunks": 0, "extract_s": 0.0, "embed_s": 0.0})
+        size, overlap = self.db.chunk_size, self.db.chunk_overlap
+        sources = {path: (source, fingerprint) for path, source, fingerprint in todo}
+
+        def store(path:str, docs:list, extract_s:float) -> None:
+            source, fingerprint = sources[path]
+            if source in self.checkpoint:
+                self.db.deleteSource(source)  # drop chunks of the previous version
+            stats = self.db.addStream(docs, batchSize=self.batchSize)
+            ext = os.path.splitext(path)[1].lower()
+            byType[ext]["files"] += 1
+            byType[ext]["chunks"] += len(docs)
+            byType[ext]["extract_s"] += extract_s
+            byType[ext]["embed_s"] += stats["embed_s"]
+            self.checkpoint[source] = {**fingerprint, "chunks": len(docs)}
+            self.save()
+
+        failed:dict[str, str] = {}
+
+        def finish(path:str, future:Future) -> None:
+            try:
+                store(*future.result())
+            except Exception as e:
+                source, fingerprint = sources[path]
+                failed[source] = f"{type(e).__name__}: {e}"
+                # an earlier version's chunks stay; the file is retried once it changes
+                self.checkpoint[source] = {**fingerprint, "error": failed[source]}
+                self.save()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                inFlight:deque[tuple[str, Future]] = deque()
+                for path, source, _ in todo:
+                    inFlight.append((path, pool.submit(_extract, path, source, size, overlap)))
+                    if len(inFlight) >= self.workers * 2:
+                        finish(*inFlight.popleft())
+                while inFlight:
+                    finish(*inFlight.popleft())
+        finally:
+            self.save()
+
+        seconds = time.perf_counter() - start
+        files = sum(t["files"] for t in byType.values())
+        chunks = sum(t["chunks"] for t in byType.values())
+        summary = {
+            "files": files,
+            "skipped": skipped,
+            "failed": failed,
+            "chunks": chunks,
+            "seconds": seconds,
+            "files/s": files / seconds if seconds else 0.0,
+            "chunks/s": chunks / seconds if seconds else 0.0,
+            "types": dict(byType),
+        }
+        if self.db.verbose:
+            showSummary(summary)
+        return summary
+
+def showSummary(summary:dict) -> None:
+    table = Table(title=f"Ingested {summary['files']} files ({summary['skipped']} unchanged) in {summary['seconds']:.2f}s")
+    table.add_column("Type", justify="left", style="cyan")
+    table.add_column("Files", justify="right")
+    table.add_column("Chunks", justify="right")
+    table.add_column("Extract (s)", justify="right", style="magenta")
+    table.add_column("Embed (s)", justify="right", style="magenta")
+    table.add_column("Embed s/file", justify="right", style="green")
+    for ext, t in sorted(summary["types"].items()):
+        table.add_row(
+            ext,
+            str(t["files"]),
+            str(t["chunks"]),
+            f"{t['extract_s']:.2f}",
+            f"{t['embed_s']:.2f}",
+            f"{t['embed_s'] / t['files']:.3f}" if t["files"] else "-",
+        )
+    print(table)
+    print(f"{summary['files/s']:.2f} files/s, {summary['chunks/s']:.1f} chunks/s")
+    for source, error in summary["failed"].items():
+        print(f"[red]failed: {source}: {error}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bulk ingest a directory into the CodeBrew knowledge store")
+    parser.add_argument("root")
+    parser.add_argument("--name", default="my_db", help="persistent db folder")
+    parser.add_argument("--collection", default="my_collection")
+    parser.add_argument("--checkpoint", default=None, help="by default <name>/ingest_checkpoint.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    db = Db(persistent=True, name=args.name, collection_name=args.collection, verbose=True)
+    Ingestor(
+        db,
+        checkpoint=args.checkpoint or os.path.join(args.name, "ingest_checkpoint.json"),
+        workers=args.workers,
+        batchSize=args.batch_size,
+    ).run(args.root)
@@ -0,0 +1,367 @@
+"""
+Vector store backends for `Db`.
+
+`Db` embeds documents itself and hands the vectors to a `VectorStore`, so the
+storage/search engine is pluggable:
+
+- `ChromaStore` wraps a chromadb collection (the previous behaviour).
+- `NumpyStore` keeps the vectors in an on-disk memory-mapped matrix and does
+  exact top-k with `argpartition`. Nothing to start, no client, and with
+  `quantize=True` the scanned matrix is int8 (4x smaller than float32). On
+  disk the best candidates are then re-ranked against the float32 rows of the
+  memory-mapped file; in memory only the int8 rows and their scales are kept
+  and the int8 scores are final.
+
+Every `query` returns chroma-shaped results: a dict of `ids`, `documents`,
+`metadatas` and `distances`, each holding one list per query embedding.
+"""
+from abc import ABC, abstractmethod
+from typing import Iterator
+import threading
+import json
+import os
+
+BLOCK = 16384
+
+class VectorStore(ABC):
+    @abstractmethod
+    def upsert(self, ids:list[str], documents:list[str], embeddings:list, metadatas:list[dict|None]|None = None) -> None:
+        ...
+
+    @abstractmethod
+    def existing(self, ids:list[str]) -> set[str]:
+        ...
+
+    @abstractmethod
+    def query(self, embeddings:list, n_results:int = 5) -> dict[str, list]:
+        ...
+
+    @abstractmethod
+    def delete(self, ids:list[str]|None = None, where:dict|None = None) -> None:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def items(self) -> Iterator[tuple[str, str, dict|None]]:
+        """Yields (id, document, metadata) for every stored document."""
+
+class ChromaStore(VectorStore):
+    def __init__(self, collection) -> None:
+        self.collection = collection
+
+    def upsert(self, ids, documents, embeddings, metadatas = None) -> None:
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def existing(self, ids) -> set[str]:
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def query(self, embeddings, n_results = 5) -> dict[str, list]:
+        return self.collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    def delete(self, ids = None, where = None) -> None:
+        self.collection.delete(ids=ids, where=where)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def items(self, pageSize:int = 1000) -> Iterator[tuple[str, str, dict|None]]:
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=pageSize, offset=offset)
+            if not page["ids"]:
+                return
+            yield from zip(page["ids"], page["documents"], page["metadatas"] or [None] * len(page["ids"]))
+            offset += len(page["ids"])
+
+OPS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+def matches(meta:dict|None, where:dict) -> bool:
+    """Evaluates a chroma-style `where` filter against one metadata dict."""
+    meta = meta or {}
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches(meta, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(meta, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            if not all(OPS[op](meta.get(key), value) for op, value in cond.items()):
+                return False
+        elif meta.get(key) != cond:
+            return False
+    return True
+
+class NumpyStore(VectorStore):
+    def __init__(self, path:str|None = None, quantize:bool = False, rerank:int = 4) -> None:
+        """
+        Parameters
+        ----------
+        path : str|None, optional
+            Folder for `vectors.f32`, `vectors.i8` and `docs.jsonl`; None keeps
+            everything in memory, by default None
+        quantize : bool, optional
+            Scan an int8 copy of the matrix instead of float32, by default False.
+            Without a path no float32 copy is kept at all.
+        rerank : int, optional
+            With quantize and a path, re-rank `n_results * rerank` int8
+            candidates against the float32 file, by default 4
+        """
+        import numpy as np
+        self.np = np
+        self.path = path
+        self.quantize = quantize
+        self.rerank = rerank
+        self.lock = threading.RLock()
+        self.dim = 0
+        self.rows = 0
+        self.capacity = 0
+        self.vectors = None  # float32 [capacity, dim], unit length; None when quantized in memory
+        self.qvectors = None  # int8 [capacity, dim]
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.ids:list[str] = []
+        self.documents:list[str] = []
+        self.metadatas:list[dict|None] = []
+        self.rowOf:dict[str, int] = {}
+        self._log = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _file(self, name:str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        np = self.np
+        infoPath = self._file("store.json")
+        if os.path.exists(infoPath):
+            with open(infoPath, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            self.dim = info["dim"]
+            self.quantize = info.get("quantize", False)
+        logPath = self._file("docs.jsonl")
+        records:dict[int, dict] = {}
+        if os.path.exists(logPath):
+            with open(logPath, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn write
+                    record = json.loads(line)
+                    if "del" in record:
+                        row = self.rowOf.pop(record["del"], None)
+                        if row is not None:
+                            records[row]["dead"] = True
+                        continue
+                    records[record["row"]] = record
+                    self.rowOf[record["id"]] = record["row"]
+        self.rows = max(records) + 1 if records else 0
+        self.ids = [""] * self.rows
+        self.documents = [""] * self.rows
+        self.metadatas = [None] * self.rows
+        alive = np.zeros(self.rows, dtype=bool)
+        for row, record in records.items():
+            self.ids[row], self.documents[row], self.metadatas[row] = record["id"], record["doc"], record.get("meta")
+            alive[row] = not record.get("dead", False)
+        if self.dim:
+            self._reserve(max(self.rows, 1024))
+            self.alive[:self.rows] = alive
+        self._log = open(logPath, "a", encoding="utf-8")
+
+    def _reserve(self, capacity:int) -> None:
+        np = self.np
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, self.capacity * 2)
+        if self.path:
+            self.vectors = self._map("vectors.f32", np.float32, (capacity, self.dim))
+            if self.quantize:
+                self.qvectors = self._map("vectors.i8", np.int8, (capacity, self.dim))
+                self.scales = self._map("scales.f32", np.float32, (capacity,))
+        else:
+            if not self.quantize:
+                vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+                if self.vectors is not None:
+                    vectors[:self.capacity] = self.vectors
+                self.vectors = vectors
+            else:
+                qvectors = np.zeros((capacity, self.dim), dtype=np.int8)
+                scales = np.zeros(capacity, dtype=np.float32)
+                if self.qvectors is not None:
+                    qvectors[:self.capacity] = self.qvectors
+                    scales[:self.capacity] = self.scales
+                self.qvectors, self.scales = qvectors, scales
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        self.capacity = capacity
+
+    def _map(self, name:str, dtype, shape:tuple[int, ...]):
+        np = self.np
+        path = self._file(name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _normalize(self, embeddings):
+        np = self.np
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def upsert(self, ids, documents, embeddings, metadatas = None) -> None:
+        np = self.np
+        matrix = self._normalize(embeddings)
+        with self.lock:
+            if not self.dim:
+                self.dim = matrix.shape[1]
+                if self.path:
+                    with open(self._file("store.json"), "w", encoding="utf-8") as f:
+                        json.dump({"dim": self.dim, "quantize": self.quantize}, f)
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match store dimension {self.dim}")
+            rows = []
+            for id_ in ids:
+                row = self.rowOf.get(id_)
+                if row is None:
+                    row = self.rows
+                    self.rows += 1
+                    self.ids.append(id_)
+                    self.documents.append("")
+                    self.metadatas.append(None)
+                    self.rowOf[id_] = row
+                rows.append(row)
+            self._reserve(self.rows)
+            rows = np.asarray(rows)
+            if self.vectors is not None:
+                self.vectors[rows] = matrix
+            if self.quantize:
+                scales = np.abs(matrix).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self.qvectors[rows] = np.round(matrix / scales[:, None]).astype(np.int8)
+                self.scales[rows] = scales
+            self.alive[rows] = True
+            records = []
+            for i, row in enumerate(rows.tolist()):
+                meta = metadatas[i] if metadatas else None
+                self.documents[row] = documents[i]
+                self.metadatas[row] = meta
+                records.append({"row": row, "id": self.ids[row], "doc": documents[i], "meta": meta})
+            self._flush(records)
+
+    def _flush(self, records:list[dict]) -> None:
+        # the memory maps are shared with the files, so the rows written above are
+        # already in the page cache; msync happens in `sync`, not per batch
+        if not self.path:
+            return
+        self._log.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._log.flush()
+
+    def sync(self) -> None:
+        """Forces the memory-mapped matrices to disk."""
+        with self.lock:
+            for matrix in (self.vectors, self.qvectors, self.scales):
+                if matrix is not None and hasattr(matrix, "flush"):
+                    matrix.flush()
+
+    def existing(self, ids) -> set[str]:
+        with self.lock:
+            return {id_ for id_ in ids if id_ in self.rowOf}
+
+    def _scores(self, queries, rows:int):
+        """Scores every row against every query, a block of rows at a time so the
+        int8 matrix is never expanded to float32 as a whole."""
+        np = self.np
+        matrix = self.qvectors if self.quantize else self.vectors
+        scores = np.empty((len(queries), rows), dtype=np.float32)
+        for start in range(0, rows, BLOCK):
+            stop = min(start + BLOCK, rows)
+            block = matrix[start:stop]
+            if self.quantize:
+                block = block.astype(np.float32)
+            scores[:, start:stop] = queries @ block.T
+        if self.quantize:
+            scores *= self.scales[:rows]
+        scores[:, ~self.alive[:rows]] = -np.inf
+        return scores
+
+    def query(self, embeddings, n_results = 5) -> dict[str, list]:
+        np = self.np
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        queries = self._normalize(embeddings)
+        with self.lock:
+            rows = self.rows
+            live = int(self.alive[:rows].sum()) if rows else 0
+            k = min(n_results, live)
+            if k == 0:
+                for key in result:
+                    result[key] = [[] for _ in queries]
+                return result
+            allScores = self._scores(queries, rows)
+            for q, scores in zip(queries, allScores):
+                if self.quantize and self.vectors is not None:
+                    pool = min(k * self.rerank, live)
+                    candidates = np.sort(np.argpartition(-scores, pool - 1)[:pool])  # sorted: sequential memmap reads
+                    exact = self.vectors[candidates] @ q
+                    order = np.argsort(-exact)[:k]
+                    top, topScores = candidates[order], exact[order]
+                else:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    topScores = scores[top]
+                top = top.tolist()
+                result["ids"].append([self.ids[r] for r in top])
+                result["documents"].append([self.documents[r] for r in top])
+                result["metadatas"].append([self.metadatas[r] for r in top])
+                result["distances"].append((1 - topScores).astype(float).tolist())
+        return result
+
+    def delete(self, ids = None, where = None) -> None:
+        with self.lock:
+            targets = list(ids or [])
+            if where:
+                targets += [self.ids[r] for r in self.rowOf.values() if matches(self.metadatas[r], where)]
+            records = []
+            for id_ in targets:
+                row = self.rowOf.pop(id_, None)
+                if row is not None:
+                    self.alive[row] = False
+                    records.append({"del": id_})
+            if records and self.path:
+                self._log.write("".join(json.dumps(r) + "\n" for r in records))
+                self._log.flush()
+
+    def count(self) -> int:
+        return len(self.rowOf)
+
+    def items(self) -> Iterator[tuple[str, str, dict|None]]:
+        for id_, row in list(self.rowOf.items()):
+            yield id_, self.documents[row], self.metadatas[row]
+
+    def close(self) -> None:
+        if self.path:
+            self.sync()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,131 @@
+"""
+Load test for `plugins.codebrew.server` backed by a local stand-in LLM.
+
+    python -m plugins.codebrew.loadtest --sessions 8,32,128 --turns 5 --latency 0.2
+
+For every session count it starts an in-process AgentServer, runs that many
+concurrent clients doing `--turns` turns each, and reports throughput and
+p50/p95 turn latency. The last line reports how many sessions per core the host
+sustained while keeping p95 under `--p95-target`.
+"""
+from plugins.codebrew.server import AgentServer
+from rich.table import Table
+from rich import print
+import statistics
+import asyncio
+import json
+import time
+import os
+
+class StubLLM:
+    """Stand-in LLM: sleeps like a network call and answers with a tiny script."""
+    USER = "user"
+    ASSISTANT = "assistant"
+    SYSTEM = "system"
+    def __init__(self, latency: float = 0.2, script: bool = True) -> None:
+        self.messages: list[dict[str, str]] = []
+        self.latency = latency
+        self.script = script
+
+    def run(self, prompt: str | None = None) -> str:
+        time.sleep(self.latency)
+        if self.script:
+            return "```python\nprint('ok')\n```"
+        return "ok"
+
+    def add_message(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+
+
+async def request(host: str, port: int, method: str, path: str, payload: dict | None = None) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(body or b"{}")
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def runLoad(sessions: int, turns: int, latency: float, script: bool, maxTurns: int) -> dict:
+    server = AgentServer(lambda: StubLLM(latency, script), port=0, maxSessions=sessions, maxTurns=maxTurns)
+    await server.start()
+    latencies: list[float] = []
+    failures = 0
+
+    async def client(sid: str) -> None:
+        nonlocal failures
+        for i in range(turns):
+            start = time.perf_counter()
+            status, _ = await request(server.host, server.port, "POST", f"/sessions/{sid}/turn", {"prompt": f"turn {i}"})
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(f"s{n}") for n in range(sessions)))
+    wall = time.perf_counter() - start
+    await server.close()
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "failures": failures,
+        "turns/s": len(latencies) / wall if wall else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": percentile(latencies, 95),
+    }
+
+
+def main(sessionCounts: list[int], turns: int, latency: float, script: bool, maxTurns: int, p95Target: float) -> list[dict]:
+    cores = os.cpu_count() or 1
+    results = [asyncio.run(runLoad(n, turns, latency, script, maxTurns)) for n in sessionCounts]
+
+    table = Table(title=f"CodeBrew load test ({cores} cores, stub latency {latency*1000:.0f} ms)")
+    for column in ("Sessions", "Turns", "Failures", "Turns/s", "p50 (ms)", "p95 (ms)"):
+        table.add_column(column, justify="right")
+    for r in results:
+        table.add_row(
+            str(r["sessions"]),
+            str(r["turns"]),
+            str(r["failures"]),
+            f"{r['turns/s']:.1f}",
+            f"{r['p50']*1000:.1f}",
+            f"{r['p95']*1000:.1f}",
+        )
+    print(table)
+
+    ok = [r["sessions"] for r in results if r["p95"] <= p95Target and not r["failures"]]
+    if ok:
+        print(f"sessions per core at p95 <= {p95Target*1000:.0f} ms: {max(ok) / cores:.2f}")
+    else:
+        print(f"no run kept p95 under {p95Target*1000:.0f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="CodeBrew server load test")
+    parser.add_argument("--sessions", default="8,32,128", help="comma separated session counts")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--no-script", action="store_true", help="stub replies without a script (measures the server alone)")
+    parser.add_argument("--max-turns", type=int, default=32)
+    parser.add_argument("--p95-target", type=float, default=2.0, help="p95 target in seconds")
+    args = parser.parse_args()
+    main(
+        [int(n) for n in args.sessions.split(",")],
+        args.turns,
+        args.latency,
+        not args.no_script,
+        args.max_turns,
+        args.p95_target,
+    )
@@ -0,0 +1,284 @@
+"""
+Multi-session asyncio HTTP server for CodeBrew.
+
+Every session id gets its own LLM + CodeBrew pair, so conversation state is kept
+per user instead of per process. The LLM clients are synchronous, so requests are
+run on a bounded thread pool (`maxTurns`) and scripts on a second bounded pool
+(`scriptWorkers`); the event loop itself never blocks.
+
+Backpressure / fairness
+-----------------------
+- a session runs at most one turn at a time, and may queue `maxPending` more;
+  anything beyond that is rejected with 429 instead of piling up.
+- at most `maxTurns` turns run at once across all sessions. Because a session can
+  hold only one of those slots, a chatty session can never starve the others.
+- at most `maxSessions` sessions may exist. Sessions idle for `idleTimeout`
+  seconds are evicted (and resumed from their journal if they come back), so
+  new ones only get 503 while every slot is held by a recently active session.
+- request bodies above `maxBody` bytes are refused with 413 before they are read.
+
+Endpoints
+---------
+POST   /sessions/<id>/turn   {"prompt": "..."}  -> {"session", "output", "ms"}
+DELETE /sessions/<id>
+GET    /health
+
+Run with `python -m plugins.codebrew.server --port 8000`.
+"""
+from plugins.codebrew.CodeBrew import CodeBrew
+from plugins.codebrew.Journal import SessionJournal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import asyncio
+import json
+import time
+import re
+import os
+
+try:from llm.example import LLM
+except:...
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+class Session:
+    def __init__(self, sid: str, codebrew: CodeBrew) -> None:
+        self.sid = sid
+        self.codebrew = codebrew
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.turns = 0
+        self.lastUsed = time.monotonic()
+
+class AgentServer:
+    def __init__(
+            self,
+            llmFactory: Callable[[], LLM],
+            host: str = "127.0.0.1",
+            port: int = 8000,
+            maxSessions: int = 256,
+            maxTurns: int = 32,
+            maxPending: int = 2,
+            scriptWorkers: int | None = None,
+            keepHistory: bool = True,
+            journalDir: str | None = None,
+            idleTimeout: float = 900.0,
+            maxBody: int = 1 << 20,
+            ) -> None:
+        """
+        Parameters
+        ----------
+        llmFactory : Callable[[], LLM]
+            Builds a fresh LLM for a new session. It must not share its
+            `messages` list with other sessions.
+        host, port : str, int
+            Address to listen on. Port 0 picks a free port.
+        maxSessions : int
+            Maximum number of live sessions.
+        maxTurns : int
+            Maximum number of turns running at the same time (LLM pool size).
+        maxPending : int
+            Turns a single session may queue behind its running turn.
+        scriptWorkers : int | None
+            Size of the script executor pool, by default the cpu count.
+        keepHistory : bool
+            Passed to every session's CodeBrew.
+        journalDir : str | None
+            If set, every session is journaled there and resumed from it
+            when the same session id comes back after a restart.
+        idleTimeout : float
+            Seconds without a turn after which a session is evicted.
+        maxBody : int
+            Largest accepted request body in bytes, by default 1 MiB.
+        """
+        self.llmFactory = llmFactory
+        self.host = host
+        self.port = port
+        self.maxSessions = maxSessions
+        self.maxPending = maxPending
+        self.keepHistory = keepHistory
+        self.journalDir = journalDir
+        self.idleTimeout = idleTimeout
+        self.maxBody = maxBody
+        self.sessions: dict[str, Session] = {}
+        self.slots = asyncio.Semaphore(maxTurns)
+        self.llmExecutor = ThreadPoolExecutor(max_workers=maxTurns, thread_name_prefix="llm")
+        self.scriptExecutor = ThreadPoolExecutor(max_workers=scriptWorkers or os.cpu_count() or 1, thread_name_prefix="script")
+        self.server: asyncio.base_events.Server | None = None
+        self.reaper: asyncio.Task | None = None
+        self.stats = {"turns": 0, "rejected": 0, "errors": 0, "evicted": 0}
+
+    def drop(self, sid: str) -> None:
+        session = self.sessions.pop(sid)
+        if session.codebrew.journal is not None:
+            session.codebrew.journal.close()
+
+    def evictIdle(self) -> int:
+        """Drops sessions with no queued turn that were last used more than `idleTimeout` ago."""
+        cutoff = time.monotonic() - self.idleTimeout
+        idle = [sid for sid, s in self.sessions.items() if not s.pending and s.lastUsed < cutoff]
+        for sid in idle:
+            self.drop(sid)
+        self.stats["evicted"] += len(idle)
+        return len(idle)
+
+    async def reap(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idleTimeout / 4))
+            self.evictIdle()
+
+    def session(self, sid: str) -> Session | None:
+        session = self.sessions.get(sid)
+        if session is None:
+            if len(self.sessions) >= self.maxSessions and not self.evictIdle():
+                return None
+            journal = SessionJournal(self.journalDir, sid) if self.journalDir else None
+            codebrew = CodeBrew(self.llmFactory(), keepHistory=self.keepHistory, echo=False, journal=journal)
+            session = self.sessions[sid] = Session(sid, codebrew)
+        return session
+
+    async def turn(self, sid: str, prompt: str) -> tuple[int, dict]:
+        session = self.session(sid)
+        if session is None:
+            self.stats["rejected"] += 1
+            return 503, {"error": "too many sessions"}
+        if session.pending > self.maxPending:
+            self.stats["rejected"] += 1
+            return 429, {"error": "session busy"}
+        session.pending += 1
+        session.lastUsed = time.monotonic()
+        try:
+            async with session.lock:
+                async with self.slots:
+                    start = time.perf_counter()
+                    output = await session.codebrew.arun(prompt, self.llmExecutor, self.scriptExecutor)
+                    ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            self.stats["errors"] += 1
+            return 500, {"error": str(e)}
+        finally:
+            session.pending -= 1
+            session.lastUsed = time.monotonic()
+        session.turns += 1
+        self.stats["turns"] += 1
+        return 200, {"session": sid, "output": output, "ms": round(ms, 3)}
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            return 200, {"sessions": len(self.sessions), **self.stats}
+        if len(parts) < 2 or parts[0] != "sessions":
+            return 404, {"error": "not found"}
+        sid = parts[1]
+        if not re.fullmatch(r"[A-Za-z0-9_.-]{1,64}", sid):
+            return 400, {"error": "invalid session id"}
+        if method == "DELETE" and len(parts) == 2:
+            session = self.sessions.get(sid)
+            if session is None:
+                return 404, {"error": "no such session"}
+            if session.pending:
+                return 429, {"error": "session busy"}
+            self.drop(sid)
+            return 200, {"session": sid, "closed": True}
+        if len(parts) == 3 and parts[2] == "turn":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                prompt = json.loads(body or b"{}")["prompt"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": "body must be {\"prompt\": str}"}
+            return await self.turn(sid, prompt)
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = None
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", 0))
+                if length < 0:
+                    raise ValueError("negative content-length")
+                if length > self.maxBody:
+                    status, payload = 413, {"error": f"body larger than {self.maxBody} bytes"}
+                else:
+                    request = method.upper(), path, await reader.readexactly(length)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                status, payload = 400, {"error": "bad request"}
+            if request is not None:
+                try:
+                    status, payload = await self.route(*request)
+                except Exception as e:
+                    # e.g. the LLM factory or the journal failing while a session is created
+                    self.stats["errors"] += 1
+                    status, payload = 500, {"error": str(e)}
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.reaper = asyncio.create_task(self.reap())
+
+    async def serve(self) -> None:
+        await self.start()
+        print(f"CodeBrew server listening on http://{self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self) -> None:
+        if self.reaper is not None:
+            self.reaper.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.llmExecutor.shutdown(wait=False, cancel_futures=True)
+        self.scriptExecutor.shutdown(wait=False, cancel_futures=True)
+
+
+def defaultLLM() -> LLM:
+    from plugins.codebrew import codebrewPrompt, samplePrompt
+    from llm.ChatGpt import LLM
+    return LLM(max_tokens=4096, messages=samplePrompt(), system_prompt=codebrewPrompt())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="CodeBrew multi-session server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-sessions", type=int, default=256)
+    parser.add_argument("--max-turns", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=2)
+    parser.add_argument("--script-workers", type=int, default=None)
+    parser.add_argument("--journal-dir", default=None, help="persist and resume sessions from this folder")
+    parser.add_argument("--idle-timeout", type=float, default=900.0, help="evict sessions idle for this many seconds")
+    parser.add_argument("--max-body", type=int, default=1 << 20, help="largest accepted request body in bytes")
+    args = parser.parse_args()
+    server = AgentServer(
+        defaultLLM,
+        host=args.host,
+        port=args.port,
+        maxSessions=args.max_sessions,
+        maxTurns=args.max_turns,
+        maxPending=args.max_pending,
+        scriptWorkers=args.script_workers,
+        journalDir=args.journal_dir,
+        idleTimeout=args.idle_timeout,
+        maxBody=args.max_body,
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
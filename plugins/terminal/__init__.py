@@ -0,0 +1,2 @@
+from plugins.terminal.main import execute_powershell_command, run_command, get_session
+from plugins.terminal.shell import PersistentShell, ShellResult
\ No newline at end of file
@@ -1,34 +1,49 @@
-import subprocess
+import threading
+import atexit
+
+try:from terminal.shell import PersistentShell, ShellResult
+except ImportError:from plugins.terminal.shell import PersistentShell, ShellResult
+
+_session:PersistentShell|None = None
+_sessionLock = threading.Lock()
+
+def get_session() -> PersistentShell:
+    """The shell shared by every call: pwsh/powershell on Windows, bash/sh elsewhere."""
+    global _session
+    with _sessionLock:
+        if _session is None:
+            _session = PersistentShell()
+            atexit.register(_session.close)
+        return _session
+
+def run_command(command:str, timeout:float|None = None) -> ShellResult:
+    return get_session().run(command, timeout)
 
 def execute_powershell_command(command, timeout):
     try:
-        # Execute the PowerShell command with a timeout
-        result = subprocess.run(
-            ["powershell", "-Command", command], 
-            capture_output=True, 
-            text=True, 
-            timeout=timeout
-        )
-        
+        # Run the command in the persistent session, interrupting it after timeout seconds
+        result = run_command(command, timeout)
+
+        if result.timed_out:
+            return f"Error: Command timed out after {timeout} seconds"
+
         # Check if there were any errors
         if result.returncode != 0:
-            return f"Error: {result.stderr}"
+            return f"Error: {result.stderr or f'exited with code {result.returncode}'}"
         
         # Return the output of the command
         return result.stdout
-    except subprocess.TimeoutExpired:
-        return f"Error: Command timed out after {timeout} seconds"
     except Exception as e:
         return str(e)
 
 def main():
-    print("Welcome to the PowerShell Agent Terminal Tool with Timeout")
+    print(f"Welcome to the Agent Terminal Tool with Timeout ({get_session().shell} session)")
 
     # Get the timeout value from the user
     timeout = 1
     while True:
         # Get the command from the user
-        command = input("Enter PowerShell command (or 'exit' to quit): ")
+        command = input("Enter command (or 'exit' to quit): ")
         
         if command.lower() == 'exit':
             break
@@ -0,0 +1,310 @@
+"""
+A shell process kept alive across commands.
+
+Each command is written to the shell's stdin followed by a line that prints a
+unique sentinel with the exit code and working directory, on stdout and on
+stderr, so output is split at the sentinel instead of at process exit. `cd`,
+exported variables and functions persist between commands, and a command costs
+a pipe round trip instead of an interpreter start.
+
+On timeout the running command is interrupted (SIGINT to its process group,
+then SIGKILL) while the shell itself survives. Only when that does not bring
+the shell back (e.g. a builtin `while true` loop) is the session restarted in
+the last known directory.
+
+>>> with PersistentShell() as shell:
+...     _ = shell.run("cd /tmp")
+...     shell.run("pwd").stdout
+'/tmp\\n'
+"""
+from typing import NamedTuple
+import subprocess
+import threading
+import shutil
+import signal
+import base64
+import time
+import uuid
+import os
+
+class ShellResult(NamedTuple):
+    stdout: str
+    stderr: str
+    returncode: int
+    timed_out: bool
+    seconds: float
+
+def defaultShell() -> str:
+    """bash, else sh; on Windows pwsh, else powershell."""
+    candidates = ["pwsh", "powershell"] if os.name == "nt" else ["bash", "sh"]
+    for name in candidates:
+        if shutil.which(name):
+            return name
+    raise FileNotFoundError(f"No shell found, tried {', '.join(candidates)}")
+
+def _children(pid:int) -> list[int]:
+    """Direct children of `pid` from /proc (Linux), else from `pgrep -P`."""
+    try:
+        pids = []
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                pids += [int(p) for p in f.read().split()]
+        return pids
+    except OSError:
+        pass
+    try:
+        out = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+        return [int(p) for p in out.split()]
+    except OSError:
+        return []
+
+def _descendants(pid:int) -> list[int]:
+    pids = []
+    for child in _children(pid):
+        pids += [child] + _descendants(child)
+    return pids
+
+class _Reader(threading.Thread):
+    """Drains one pipe into a buffer so the shell never blocks on a full pipe."""
+    def __init__(self, pipe) -> None:
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.buffer = bytearray()
+        self.closed = False
+        self.cond = threading.Condition()
+        self.start()
+
+    def run(self) -> None:
+        fd = self.pipe.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            with self.cond:
+                if not chunk:
+                    self.closed = True
+                    self.cond.notify_all()
+                    return
+                self.buffer += chunk
+                self.cond.notify_all()
+
+    def until(self, marker:bytes, deadline:float|None) -> int:
+        """Index of `marker` in the buffer, -1 once the pipe closed, None on timeout."""
+        with self.cond:
+            while True:
+                index = self.buffer.find(marker)
+                if index >= 0:
+                    return index
+                if self.closed:
+                    return -1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def take(self, size:int, skip:int = 0) -> bytes:
+        with self.cond:
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size + skip]
+            return data
+
+    def drain(self) -> bytes:
+        with self.cond:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+
+class PersistentShell:
+    """
+    Parameters
+    ----------
+    shell : str | None, optional
+        "bash", "sh", "pwsh", "powershell" or a path to one of them, by default `defaultShell()`
+    cwd : str | None, optional
+        Starting directory, by default the current one
+    env : dict | None, optional
+        Environment of the shell, by default inherited
+    grace : float, optional
+        Seconds an interrupted command gets to exit before it is killed, and
+        again before the session is restarted, by default 2.0
+    encoding : str, optional
+        Used to decode output, by default "utf-8"
+    """
+    def __init__(self, shell:str|None = None, cwd:str|None = None, env:dict|None = None, grace:float = 2.0, encoding:str = "utf-8") -> None:
+        self.shell = shell or defaultShell()
+        self.powershell = os.path.basename(self.shell).lower().split(".")[0] in ("pwsh", "powershell")
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self.env = env
+        self.grace = grace
+        self.encoding = encoding
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.process:subprocess.Popen|None = None
+        self._start()
+
+    def _start(self) -> None:
+        if self.powershell:
+            args = [self.shell, "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"]
+        elif os.path.basename(self.shell).startswith("bash"):
+            args = [self.shell, "--noprofile", "--norc"]
+        else:
+            args = [self.shell]
+        kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" else {"start_new_session": True}
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd,
+            env=self.env,
+            **kwargs,
+        )
+        self.stdout = _Reader(self.process.stdout)
+        self.stderr = _Reader(self.process.stderr)
+        if not self.powershell:
+            # job control puts every foreground job in its own process group, so a
+            # timeout can interrupt the job without signalling the shell; the trap
+            # keeps bash from exiting when its foreground job dies of SIGINT
+            self._write("set -m 2>/dev/null; trap : INT\n")
+
+    def _write(self, text:str) -> None:
+        self.process.stdin.write(text.encode(self.encoding))
+        self.process.stdin.flush()
+
+    def _script(self, command:str, token:str) -> str:
+        if self.powershell:
+            encoded = base64.b64encode(command.encode("utf-8")).decode("ascii")
+            return (
+                "$global:LASTEXITCODE = 0; $__ok = $true; "
+                f"try {{ Invoke-Expression ([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{encoded}'))) }} "
+                "catch { $__ok = $false; [Console]::Error.WriteLine($_) }; "
+                "$__rc = if ($LASTEXITCODE) { $LASTEXITCODE } elseif ($__ok -and $?) { 0 } else { 1 }; "
+                f"[Console]::Out.Write(\"`n{token} $__rc $($PWD.ProviderPath)`n\"); [Console]::Error.Write(\"`n{token}`n\")\n"
+            )
+        quoted = command.replace("'", "'\\''")
+        # eval keeps unbalanced quotes inside the command from swallowing the sentinel
+        # (`command` makes its syntax errors non-fatal in sh), and stdin comes from
+        # /dev/null so the command cannot read the next script
+        return (
+            f"command eval '{quoted}' < /dev/null\n"
+            f"printf '\\n%s %d %s\\n' '{token}' \"$?\" \"$PWD\"; printf '\\n%s\\n' '{token}' >&2\n"
+        )
+
+    def _interrupt(self, sig:int) -> None:
+        pid = self.process.pid
+        if os.name == "nt":
+            return  # no process groups to signal; the session is restarted instead
+        shellGroup = os.getpgid(pid)
+        for child in _descendants(pid):
+            try:
+                group = os.getpgid(child)
+                if group != shellGroup:
+                    os.killpg(group, sig)
+                else:
+                    os.kill(child, sig)
+            except ProcessLookupError:
+                pass
+
+    def _restart(self) -> None:
+        self.close()
+        self.restarts += 1
+        if not os.path.isdir(self.cwd):
+            self.cwd = os.getcwd()
+        self._start()
+
+    def run(self, command:str, timeout:float|None = None) -> ShellResult:
+        """
+        Runs `command` in the session.
+
+        Parameters
+        ----------
+        command : str
+            Shell source, may span several lines
+        timeout : float | None, optional
+            Seconds before the command is interrupted, by default no limit
+
+        Returns
+        -------
+        ShellResult
+            stdout, stderr, returncode, timed_out and seconds. An interrupted
+            command reports the code the shell saw (130 for SIGINT), or -1 when
+            the session had to be restarted; a command that ends the shell
+            (e.g. `exit 3`) reports the shell's exit status.
+        """
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._restart()
+            start = time.monotonic()
+            token = f"__CODEBREW_{uuid.uuid4().hex}__"
+            marker = f"\n{token} ".encode()
+            try:
+                self._write(self._script(command, token))
+            except (BrokenPipeError, OSError):
+                self._restart()
+                self._write(self._script(command, token))
+
+            timedOut = False
+            index = self.stdout.until(marker, None if timeout is None else start + timeout)
+            if index is None:
+                timedOut = True
+                for sig in (signal.SIGINT, getattr(signal, "SIGKILL", signal.SIGTERM)):
+                    self._interrupt(sig)
+                    index = self.stdout.until(marker, time.monotonic() + self.grace)
+                    if index is not None:
+                        break
+            if index is None or index < 0:
+                code = None
+                if index is not None:
+                    # stdout closed: the command ended the shell, keep its exit status
+                    try:
+                        code = self.process.wait(timeout=self.grace)
+                    except subprocess.TimeoutExpired:
+                        pass
+                    self.stderr.join(self.grace)
+                stdout = self.stdout.drain().decode(self.encoding, errors="replace")
+                stderr = self.stderr.drain().decode(self.encoding, errors="replace")
+                self._restart()
+                return ShellResult(stdout, stderr, -1 if code is None else code, timedOut, time.monotonic() - start)
+
+            stdout = self.stdout.take(index, len(marker))
+            end = self.stdout.until(b"\n", time.monotonic() + self.grace)
+            status = self.stdout.take(end or 0, 1).decode(self.encoding, errors="replace")
+            code, _, cwd = status.partition(" ")
+            returncode = int(code) if code.lstrip("-").isdigit() else -1
+            self.cwd = cwd.strip() or self.cwd
+
+            errorMarker = f"\n{token}\n".encode()
+            errorIndex = self.stderr.until(errorMarker, time.monotonic() + self.grace)
+            if errorIndex is None or errorIndex < 0:
+                stderr = self.stderr.drain()
+            else:
+                stderr = self.stderr.take(errorIndex, len(errorMarker))
+            return ShellResult(
+                stdout.decode(self.encoding, errors="replace"),
+                stderr.decode(self.encoding, errors="replace"),
+                returncode,
+                timedOut,
+                time.monotonic() - start,
+            )
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self._interrupt(getattr(signal, "SIGKILL", signal.SIGTERM))
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def __enter__(self) -> "PersistentShell":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
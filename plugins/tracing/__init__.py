@@ -0,0 +1 @@
+from llm.Tracing import Tracer, tracer, traced
\ No newline at end of file
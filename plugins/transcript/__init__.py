@@ -1 +1 @@
-from plugins.transcript.main import transcriptAudio
\ No newline at end of file
+from plugins.transcript.main import transcriptAudio, iterTranscript, aiterTranscript, TranscriptSegment
\ No newline at end of file
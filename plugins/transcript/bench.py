@@ -0,0 +1,137 @@
+"""
+Throughput benchmark for the transcript pipeline.
+
+    python -m plugins.transcript.bench talk.mp3 --recognizer offline --latency 0.5 --threads 1 2 4 8
+
+For every thread count the whole pipeline runs once and reports segments/s, the
+real-time factor (wall time / audio duration, lower is faster) and the time spent
+per stage: decode (ffmpeg pipe reads), VAD (segmentation), recognize (summed over
+worker threads) and join. With the offline recognizer this measures our own overhead.
+"""
+from rich.table import Table
+from rich import print
+import threading
+import time
+
+try:from transcript.pcm import PcmDecoder, BYTES_PER_SECOND, fixedSegments
+except ImportError:from plugins.transcript.pcm import PcmDecoder, BYTES_PER_SECOND, fixedSegments
+try:from transcript.vad import VadSegmenter
+except ImportError:from plugins.transcript.vad import VadSegmenter
+try:from transcript.recognizers import Recognizer, getRecognizer
+except ImportError:from plugins.transcript.recognizers import Recognizer, getRecognizer
+try:from transcript.main import transcribe_stream
+except ImportError:from plugins.transcript.main import transcribe_stream
+try:from transcript.limiter import AdaptiveLimiter
+except ImportError:from plugins.transcript.limiter import AdaptiveLimiter
+
+class TimedDecoder:
+    def __init__(self, decoder:PcmDecoder) -> None:
+        self.decoder = decoder
+        self.seconds = 0.0
+
+    def read(self, size:int) -> memoryview:
+        start = time.perf_counter()
+        try:
+            return self.decoder.read(size)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+class TimedRecognizer(Recognizer):
+    def __init__(self, inner:Recognizer) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.version = inner.version
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def recognize(self, audio):
+        start = time.perf_counter()
+        try:
+            return self.inner.recognize(audio)
+        finally:
+            with self.lock:
+                self.seconds += time.perf_counter() - start
+
+def runOnce(source:str, threads:int, recognizer:Recognizer, segment_duration:float = 30, vad:bool = False, adaptive:bool = False) -> dict:
+    """With `adaptive`, `threads` is the upper bound of an `AdaptiveLimiter` instead of a fixed pool size."""
+    timed = TimedRecognizer(recognizer)
+    limiter = AdaptiveLimiter(initial=2, maximum=threads) if adaptive else None
+    stats = {"threads": threads, "segments": 0, "vad_s": 0.0}
+    start = time.perf_counter()
+    with PcmDecoder(source) as raw:
+        decoder = TimedDecoder(raw)
+        if vad:
+            segments = VadSegmenter(target=segment_duration, minLength=segment_duration / 3, maxLength=segment_duration * 1.5).segments(decoder)
+        else:
+            segments = fixedSegments(decoder, segment_duration)
+
+        def timedSegments():
+            it = iter(segments)
+            while True:
+                t, decoded = time.perf_counter(), decoder.seconds
+                try:
+                    segment = next(it)
+                except StopIteration:
+                    stats["vad_s"] += time.perf_counter() - t - (decoder.seconds - decoded)
+                    return
+                stats["vad_s"] += time.perf_counter() - t - (decoder.seconds - decoded)
+                stats["segments"] += 1
+                yield segment
+
+        texts = list(transcribe_stream(timedSegments(), threads, recognizer=timed, limiter=limiter))
+        t = time.perf_counter()
+        " ".join(texts)
+        stats["join_s"] = time.perf_counter() - t
+        stats["audio_s"] = raw.bytesRead / BYTES_PER_SECOND
+    stats["wall_s"] = time.perf_counter() - start
+    stats["decode_s"] = decoder.seconds
+    stats["recognize_s"] = timed.seconds
+    stats["segments/s"] = stats["segments"] / stats["wall_s"]
+    stats["rtf"] = stats["wall_s"] / stats["audio_s"] if stats["audio_s"] else 0.0
+    stats["limit"] = f"{limiter.peak} peak, {limiter.history[-1][1]} final" if limiter else str(threads)
+    stats["history"] = limiter.history if limiter else []
+    return stats
+
+def benchmark(source:str, threads:list[int], recognizer:Recognizer, segment_duration:float = 30, vad:bool = False, adaptive:bool = False) -> list[dict]:
+    results = [runOnce(source, n, recognizer, segment_duration, vad, adaptive) for n in threads]
+    table = Table(title=f"{source} with {recognizer.id} ({results[0]['audio_s']:.0f}s of audio, {results[0]['segments']} segments)")
+    table.add_column("Threads", justify="right", style="cyan")
+    table.add_column("Concurrency", justify="right", style="cyan")
+    table.add_column("Wall (s)", justify="right")
+    table.add_column("Segments/s", justify="right", style="green")
+    table.add_column("RTF", justify="right", style="green")
+    table.add_column("Decode (s)", justify="right", style="magenta")
+    table.add_column("VAD (s)", justify="right", style="magenta")
+    table.add_column("Recognize (s)", justify="right", style="magenta")
+    table.add_column("Join (s)", justify="right", style="magenta")
+    for r in results:
+        table.add_row(
+            str(r["threads"]),
+            r["limit"],
+            f"{r['wall_s']:.2f}",
+            f"{r['segments/s']:.2f}",
+            f"{r['rtf']:.4f}",
+            f"{r['decode_s']:.2f}",
+            f"{r['vad_s']:.2f}",
+            f"{r['recognize_s']:.2f}",
+            f"{r['join_s']:.4f}",
+        )
+    print(table)
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the transcript pipeline")
+    parser.add_argument("source", help="audio file")
+    parser.add_argument("--recognizer", default="offline")
+    parser.add_argument("--latency", type=float, default=0.5, help="offline recognizer: seconds per call")
+    parser.add_argument("--per-second", type=float, default=0.0, help="offline recognizer: seconds per second of audio")
+    parser.add_argument("--threads", type=int, nargs="*", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--segment-duration", type=float, default=30)
+    parser.add_argument("--vad", action="store_true", help="cut in pauses instead of every --segment-duration seconds")
+    parser.add_argument("--adaptive", action="store_true", help="treat --threads as limiter bounds and print the chosen concurrency")
+    args = parser.parse_args()
+    kwargs = {"latency": args.latency, "perSecond": args.per_second} if args.recognizer == "offline" else {}
+    results = benchmark(args.source, args.threads, getRecognizer(args.recognizer, **kwargs), args.segment_duration, args.vad, args.adaptive)
+    for r in results if args.adaptive else []:
+        print(f"[cyan]max {r['threads']}:[/cyan] " + ", ".join(f"{t:.1f}s→{limit} ({reason})" for t, limit, reason in r["history"]))
@@ -0,0 +1,84 @@
+"""
+Persistent transcript cache.
+
+Segments are keyed by sha256(segment PCM) + boundaries + recognizer name/version
+and stored as soon as they are recognized, so an interrupted run resumes with
+only the missing (or failed) segments. A per-file manifest, keyed by the file's
+content hash, recognizer and segmentation settings, holds the finished
+transcript so an identical rerun returns without decoding at all.
+"""
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+def fileHash(path:str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def segmentKey(pcm, start:float, end:float, recognizerId:str) -> str:
+    digest = hashlib.sha256(pcm)
+    digest.update(f"\0{start:.3f}\0{end:.3f}\0{recognizerId}".encode("utf-8"))
+    return digest.hexdigest()
+
+def manifestKey(audioHash:str, recognizerId:str, settings:dict) -> str:
+    return hashlib.sha256(f"{audioHash}\0{recognizerId}\0{json.dumps(settings, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+class TranscriptCache:
+    """
+    Examples
+    --------
+    >>> cache = TranscriptCache(".transcripts.sqlite")
+    >>> cache.put(key, "hello there", 0.0, 4.2)
+    >>> cache.get(key)
+    'hello there'
+    """
+    def __init__(self, path:str = ".transcripts.sqlite") -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS segments (key TEXT PRIMARY KEY, text TEXT NOT NULL, start REAL, end REAL, created REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS manifests (key TEXT PRIMARY KEY, segments TEXT NOT NULL, created REAL)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key:str) -> str|None:
+        with self.lock:
+            row = self.conn.execute("SELECT text FROM segments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key:str, text:str, start:float, end:float) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO segments (key, text, start, end, created) VALUES (?, ?, ?, ?, ?)",
+                (key, text, start, end, time.time()),
+            )
+
+    def manifest(self, key:str) -> list[tuple[int, float, float, str]]|None:
+        """The finished transcript as (index, start, end, text) rows, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT segments FROM manifests WHERE key = ?", (key,)).fetchone()
+        return [tuple(s) for s in json.loads(row[0])] if row else None
+
+    def putManifest(self, key:str, segments:list[tuple[int, float, float, str]]) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO manifests (key, segments, created) VALUES (?, ?, ?)",
+                (key, json.dumps(segments), time.time()),
+            )
+
+    def close(self) -> None:
+        self.conn.close()
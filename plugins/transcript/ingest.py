@@ -0,0 +1,162 @@
+"""
+Streams a transcript into the CodeBrew knowledge store while it is being recognized.
+
+    python -m plugins.transcript.ingest meeting.mp3 --name my_db
+
+Finished segments are collected into small batches and handed to `Db.addStream`
+on a writer thread, so embedding overlaps recognition and the start of a long
+recording is searchable long before the end is transcribed. Recognition runs on
+its own thread, so a partial batch is written after `maxDelay` even while the
+next segment is still being recognized. Every chunk carries
+its timestamps as metadata: {"source", "segment", "start", "end"}.
+"""
+from concurrent.futures import ThreadPoolExecutor, Future
+from rich import print
+import threading
+import queue
+import time
+import os
+
+try:from db.DbCls import Db
+except ImportError:from plugins.codebrew.db.DbCls import Db
+try:from transcript.main import iterTranscript, TranscriptSegment
+except ImportError:from plugins.transcript.main import iterTranscript, TranscriptSegment
+try:from transcript.recognizers import Recognizer
+except ImportError:from plugins.transcript.recognizers import Recognizer
+try:from transcript.cache import TranscriptCache
+except ImportError:from plugins.transcript.cache import TranscriptCache
+try:from transcript.limiter import AdaptiveLimiter
+except ImportError:from plugins.transcript.limiter import AdaptiveLimiter
+
+def clock(seconds:float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def segmentDoc(name:str, segment:TranscriptSegment) -> tuple[str, dict]:
+    doc = f"[DOC_{name}_MSG_ID_{segment.index}] [{clock(segment.start)}-{clock(segment.end)}] {segment.text}"
+    return doc, {"source": name, "segment": segment.index, "start": segment.start, "end": segment.end}
+
+def ingestTranscript(
+        db:Db,
+        audio_source:str,
+        is_url:bool = False,
+        source:str|None = None,
+        batchSize:int = 8,
+        maxDelay:float = 10.0,
+        recognizer:str|Recognizer|None = None,
+        cache:str|TranscriptCache|None = "default",
+        limiter:AdaptiveLimiter|None = None,
+        vad:bool = False,
+        ) -> dict:
+    """
+    Transcribes `audio_source` and adds its segments to `db` as they arrive.
+
+    Parameters
+    ----------
+    db : Db
+        The knowledge store
+    audio_source : str
+        File path or URL
+    is_url : bool, optional
+        Whether the audio source is a URL, by default False
+    source : str | None, optional
+        Value of the `source` metadata, by default the file name
+    batchSize : int, optional
+        Segments per write, by default 8
+    maxDelay : float, optional
+        A smaller batch is written once its oldest segment has waited this many seconds, by default 10.0
+    recognizer, cache, limiter, vad : optional
+        Passed to `iterTranscript`
+
+    Returns
+    -------
+    dict
+        segments, docs, skipped, batches, seconds and first_searchable_s
+        (seconds until the first batch was stored).
+    """
+    name = source or os.path.splitext(os.path.basename(audio_source.split("?")[0]))[0]
+    stats = {"segments": 0, "docs": 0, "skipped": 0, "batches": 0, "first_searchable_s": None}
+    start = time.perf_counter()
+    batch:list[tuple[str, dict]] = []
+    oldest = 0.0
+
+    def write(docs:list[tuple[str, dict]]) -> None:
+        added = db.addStream(docs, batchSize=len(docs))
+        stats["docs"] += added["docs"]
+        stats["skipped"] += added["skipped"]
+        stats["batches"] += 1
+        if stats["first_searchable_s"] is None:
+            stats["first_searchable_s"] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending:Future|None = None
+
+        def flush() -> None:
+            nonlocal pending, batch
+            if pending is not None:
+                pending.result()  # at most one write in flight
+            pending = writer.submit(write, batch)
+            batch = []
+
+        segments:queue.Queue = queue.Queue()
+        cancel = threading.Event()
+
+        def transcribe() -> None:
+            try:
+                for segment in iterTranscript(audio_source, is_url, recognizer, cache, limiter, vad, cancel=cancel):
+                    segments.put(segment)
+            except BaseException as e:
+                segments.put(e)
+            finally:
+                segments.put(None)
+
+        reader = threading.Thread(target=transcribe, name="transcript-ingest", daemon=True)
+        reader.start()
+        try:
+            while True:
+                timeout = max(0.0, oldest + maxDelay - time.perf_counter()) if batch else None
+                try:
+                    segment = segments.get(timeout=timeout)
+                except queue.Empty:
+                    flush()  # the oldest segment has waited `maxDelay`
+                    continue
+                if segment is None:
+                    break
+                if isinstance(segment, BaseException):
+                    raise segment
+                stats["segments"] += 1
+                if segment.error is not None or segment.text == "*":
+                    continue  # a failed request, or nothing recognized
+                if not batch:
+                    oldest = time.perf_counter()
+                batch.append(segmentDoc(name, segment))
+                if len(batch) >= batchSize:
+                    flush()
+        finally:
+            cancel.set()  # a failed write stops the transcription too
+            reader.join()
+        if batch:
+            flush()
+        if pending is not None:
+            pending.result()
+
+    stats["seconds"] = time.perf_counter() - start
+    if db.verbose:
+        first = stats["first_searchable_s"]
+        print(f"[green]ingested {stats['docs']} transcript chunks of {name} ({stats['segments']} segments, {stats['skipped']} already stored) in {stats['seconds']:.2f}s, first searchable after {first or 0:.2f}s")
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Transcribe audio straight into the CodeBrew knowledge store")
+    parser.add_argument("source", help="audio file or URL")
+    parser.add_argument("--url", action="store_true", help="source is a URL")
+    parser.add_argument("--name", default="my_db", help="persistent db folder")
+    parser.add_argument("--collection", default="my_collection")
+    parser.add_argument("--recognizer", default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--vad", action="store_true", help="cut segments in pauses instead of every 30 s")
+    args = parser.parse_args()
+    db = Db(persistent=True, name=args.name, collection_name=args.collection, verbose=True)
+    ingestTranscript(db, args.source, is_url=args.url, recognizer=args.recognizer, batchSize=args.batch_size, vad=args.vad)
@@ -0,0 +1,104 @@
+"""
+AIMD concurrency limiter for recognizer calls.
+
+The limit grows by about one slot per round of completed calls while latency
+stays near the best seen and every slot is in use. It is halved when a call
+fails or is throttled (HTTP 429) or when latency climbs above `latencyTolerance`
+times the baseline. Latencies are compared per second of audio when the caller
+passes `seconds`, so longer (e.g. VAD) segments do not look like congestion.
+Every change is recorded in `history`.
+
+>>> limiter = AdaptiveLimiter(initial=2, maximum=16)
+>>> limiter.acquire()
+>>> ...  # call the recognizer
+>>> limiter.release(latency=0.8, ok=True)
+"""
+import threading
+import time
+
+def isThrottle(message:str) -> bool:
+    message = message.lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+class AdaptiveLimiter:
+    def __init__(self,
+                initial:int = 2,
+                minimum:int = 1,
+                maximum:int = 32,
+                decrease:float = 0.5,
+                latencyTolerance:float = 1.5,
+                cooldown:float = 1.0,
+                ) -> None:
+        """
+        Parameters
+        ----------
+        initial : int, optional
+            Starting concurrency, by default 2
+        minimum : int, optional
+            Lower bound, by default 1
+        maximum : int, optional
+            Upper bound (the size of the worker pool), by default 32
+        decrease : float, optional
+            Factor applied on errors, throttling or latency inflation, by default 0.5
+        latencyTolerance : float, optional
+            Latency above this multiple of the baseline counts as congestion, by default 1.5
+        cooldown : float, optional
+            Seconds after a decrease during which further decreases are ignored, so one
+            burst of failures only halves the limit once, by default 1.0
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latencyTolerance = latencyTolerance
+        self.cooldown = cooldown
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.active = 0
+        self.baseline:float|None = None
+        self.lastDecrease = 0.0
+        self.start = time.monotonic()
+        self.history:list[tuple[float, int, str]] = [(0.0, int(self.limit), "start")]
+        self.cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Blocks until a slot is free under the current limit."""
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+
+    def _record(self, reason:str) -> None:
+        current = int(self.limit)
+        if current != self.history[-1][1]:
+            self.history.append((time.monotonic() - self.start, current, reason))
+
+    def release(self, latency:float|None = None, ok:bool = True, throttled:bool = False, seconds:float|None = None) -> None:
+        """
+        Frees a slot and adapts the limit. `latency` is None for calls that did not
+        reach the recognizer (e.g. cache hits or skipped silence), which do not move
+        the limit. With `seconds`, the length of the audio sent, latency is
+        normalized to seconds per second of audio before it is compared.
+        """
+        with self.cond:
+            saturated = self.active >= int(self.limit)
+            self.active -= 1
+            now = time.monotonic()
+            if latency is not None:
+                if seconds:
+                    latency /= seconds
+                congested = self.baseline is not None and latency > self.baseline * self.latencyTolerance
+                if throttled or not ok or congested:
+                    if now - self.lastDecrease >= self.cooldown:
+                        self.limit = max(self.minimum, self.limit * self.decrease)
+                        self.lastDecrease = now
+                        self._record("throttled" if throttled else "error" if not ok else "latency")
+                else:
+                    if saturated:
+                        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                        self._record("increase")
+                    # baseline follows the fastest calls and drifts up slowly
+                    self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.05)
+            self.cond.notify_all()
+
+    @property
+    def peak(self) -> int:
+        return max(limit for _, limit, _ in self.history)
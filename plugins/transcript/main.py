@@ -1,111 +1,340 @@
-import os
-import tempfile
-import multiprocessing
-import requests
-import speech_recognition as sr
-from pydub import AudioSegment
-from concurrent.futures import ThreadPoolExecutor
-from nara.extra import TimeIt
-from dotenv import get_key
-
-def download_audio(url, temp_dir):
-    response = requests.get(url)
-    if response.status_code == 200:
-        file_path = os.path.join(temp_dir, "audio_file")
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        return file_path
-    else:
-        raise Exception(f"Failed to download audio file from URL: {url}")
-
-def transcribe_segment(audio_segment_path):
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_segment_path) as source:
-        recognizer.adjust_for_ambient_noise(source)
-        audio_data = recognizer.record(source)
-    try:
-        text = recognizer.recognize_google(audio_data)
-        return text
-    except sr.RequestError as e:
-        return f"API request error: {e}"
-    except sr.UnknownValueError:
-        return "*"
-
-def transcribe_audio(file_path, segment_duration=30):
-    audio = AudioSegment.from_file(file_path)
-
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        segments = []
-        for i in range(0, len(audio), segment_duration * 1000):
-            segment = audio[i:i + segment_duration * 1000]
-            segment_path = os.path.join(temp_dir, f"segment_{i//1000}.wav")
-            segment.export(segment_path, format='wav')
-            segments.append(segment_path)
-
-        def get_thread_cnt():
-            cpu = multiprocessing.cpu_count()
-            cpu = max(1, int(get_key(".env", "MAX_THREADS")))
-            return cpu
-
-        max_workers = get_thread_cnt()
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            transcriptions = list(executor.map(transcribe_segment, segments))
-
-    transcription = " ".join(transcriptions)
-    return transcription
-
-
-
-def transcriptAudio(audio_source:str, is_url=False) -> str:
-    """
-    Parameters
-    ----------
-    audio_source : str
-        The audio source to transcribe.
-    is_url : bool, optional
-        Whether the audio source is a URL, by default False
-
-    Returns
-    -------
-    str
-        The transcription of the audio source.
-    """
-    if is_url:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            file_path = download_audio(audio_source, temp_dir)
-            transcription = transcribe_audio(file_path)
-    else:
-        transcription = transcribe_audio(audio_source)
-
-    return transcription
-
-
-
-
-@TimeIt
-def main(audio_source, is_url=False):
-    if is_url:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            file_path = download_audio(audio_source, temp_dir)
-            transcription = transcribe_audio(file_path)
-    else:
-        transcription = transcribe_audio(audio_source)
-    
-    print(transcription)
-
-if __name__ == "__main__":
-    # Example usage:
-    # audio_url = "https://github.com/AssemblyAI-Examples/audio-examples/raw/main/20230607_me_canadian_wildfires.mp3"
-
-    local_file_path = r"C:\Users\Divyansh\Desktop\YT\Ai\plugins\transcript\ttsMP3.com_VoiceText_2024-6-14_16-30-38.mp3"
-
-    # For URL
-    # main(audio_url, is_url=True)
-
-    # print("-"*100)
-
-    # # For local file
-    main(local_file_path, is_url=False)
-
+import os
+import time
+import multiprocessing
+import speech_recognition as sr
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import AsyncIterator, Iterable, Iterator, NamedTuple
+from nara.extra import TimeIt
+from dotenv import get_key
+try:from transcript.pcm import PcmDecoder, Segment, fixedSegments, urlChunks
+except ImportError:from plugins.transcript.pcm import PcmDecoder, Segment, fixedSegments, urlChunks
+try:from transcript.vad import VadSegmenter, NoiseCalibrator, hasSpeech
+except ImportError:from plugins.transcript.vad import VadSegmenter, NoiseCalibrator, hasSpeech
+try:from transcript.recognizers import Recognizer, getRecognizer
+except ImportError:from plugins.transcript.recognizers import Recognizer, getRecognizer
+try:from transcript.limiter import AdaptiveLimiter, isThrottle
+except ImportError:from plugins.transcript.limiter import AdaptiveLimiter, isThrottle
+try:from transcript.cache import TranscriptCache, fileHash, segmentKey, manifestKey
+except ImportError:from plugins.transcript.cache import TranscriptCache, fileHash, segmentKey, manifestKey
+
+class TranscriptSegment(NamedTuple):
+    index: int
+    start: float  # seconds from the start of the recording
+    end: float
+    text: str
+    error: str|None = None  # the request error when recognition failed; `text` then holds the message
+
+def get_thread_cnt():
+    """
+    Upper bound for concurrent recognizer calls: MAX_THREADS from .env or the
+    environment, otherwise the same default as ThreadPoolExecutor (the calls are I/O bound).
+    """
+    value = (get_key(".env", "MAX_THREADS") if os.path.exists(".env") else None) or os.getenv("MAX_THREADS")
+    if value:
+        return max(1, int(value))
+    return min(32, multiprocessing.cpu_count() + 4)
+
+def _recognize(audio:sr.AudioData|Segment|str, recognizer:Recognizer) -> tuple[str, bool, bool]:
+    """
+    Returns the text, whether it is a real result (False for request errors, which
+    are worth retrying) and whether the recognizer was called at all.
+    """
+    if isinstance(audio, Segment):
+        if audio.threshold is not None and not hasSpeech(audio.pcm, audio.threshold):
+            return "*", True, False
+        audio = audio.audio()
+    elif isinstance(audio, str):
+        with sr.AudioFile(audio) as source:
+            audio = sr.Recognizer().record(source)
+    try:
+        return recognizer.recognize(audio), True, True
+    except sr.RequestError as e:
+        return f"API request error: {e}", False, True
+    except sr.UnknownValueError:
+        return "*", True, True
+
+def transcribe_segment(audio:sr.AudioData|Segment|str, recognizer:Recognizer|None = None):
+    """
+    Transcribes one segment: in-memory PCM (`Segment` / `AudioData`) or, as
+    before, the path of an audio file. `recognizer` defaults to `getRecognizer()`.
+    A segment with no frame above its calibrated threshold is not sent to the recognizer.
+    """
+    return _recognize(audio, recognizer or getRecognizer())[0]
+
+def _transcribe_cached(segment:Segment, recognizer:Recognizer, cache:TranscriptCache|None, limiter:AdaptiveLimiter|None = None) -> tuple[int, float, float, str, bool]:
+    latency, text, ok, start = None, None, True, None
+    try:
+        key = segmentKey(segment.pcm, segment.start, segment.end, recognizer.id) if cache is not None else None
+        text = cache.get(key) if key is not None else None
+        if text is None:
+            start = time.perf_counter()
+            text, ok, called = _recognize(segment, recognizer)
+            # silence skipped locally says nothing about the backend, like a cache hit
+            latency = time.perf_counter() - start if called else None
+            if ok and key is not None:
+                cache.put(key, text, segment.start, segment.end)  # stored as soon as it is done
+        return segment.index, segment.start, segment.end, text, ok
+    except BaseException as e:
+        # timeouts, connection errors, ...: a failure for the limiter too, not just RequestError
+        ok = False
+        text = str(e)
+        if start is not None and latency is None:
+            latency = time.perf_counter() - start
+        raise
+    finally:
+        if limiter is not None:
+            limiter.release(latency, ok, throttled=not ok and isThrottle(text or ""), seconds=segment.end - segment.start)
+
+CANCEL_POLL = 0.1  # seconds between checks of a `cancel` event while waiting
+
+def transcribe_segments(segments:Iterable[Segment], max_workers:int, max_in_flight:int|None = None, recognizer:Recognizer|None = None, cache:TranscriptCache|None = None, limiter:AdaptiveLimiter|None = None, cancel:threading.Event|None = None) -> Iterator[tuple[int, float, float, str, bool]]:
+    """
+    Transcribes segments on a thread pool and yields (index, start, end, text, ok)
+    in order, each one as soon as it and every segment before it are done;
+    `ok` is False for failed requests, which are not cached.
+
+    A producer thread decodes, segments and submits while this generator waits
+    on the oldest segment. At most `max_in_flight` segments (default twice the
+    workers) are submitted and not yet yielded, so memory stays bounded however
+    long the recording is. Decoding runs in the ffmpeg process and the I/O-bound
+    recognizer calls on the pool; with a `limiter` the number of concurrent calls
+    adapts between its bounds (the pool has `limiter.maximum` threads).
+
+    The generator stops early once `cancel` is set, also while it is waiting. On
+    any exit the producer is stopped and joined before returning, so `segments`
+    (e.g. a decoder) is no longer read and can be closed by the caller; queued
+    segments are cancelled and only the calls already running are waited for.
+    """
+    max_workers = limiter.maximum if limiter is not None else max_workers
+    max_in_flight = max_in_flight or max_workers * 2
+    recognizer = recognizer or getRecognizer()  # one instance shared by the workers
+    submitted:queue.Queue = queue.Queue()
+    slots = threading.Semaphore(max_in_flight)
+    stop = threading.Event()
+    poll = None if cancel is None else CANCEL_POLL
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def produce() -> None:
+            try:
+                for segment in segments:
+                    slots.acquire()
+                    if stop.is_set():
+                        return
+                    if limiter is not None:
+                        limiter.acquire()
+                        if stop.is_set():
+                            limiter.release()
+                            return
+                    submitted.put(executor.submit(_transcribe_cached, segment, recognizer, cache, limiter))
+            except BaseException as e:
+                submitted.put(e)
+            finally:
+                submitted.put(None)
+
+        producer = threading.Thread(target=produce, name="transcript-producer", daemon=True)
+        producer.start()
+        try:
+            while True:
+                try:
+                    item = submitted.get(timeout=poll)
+                except queue.Empty:
+                    if cancel.is_set():
+                        return
+                    continue
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                while not wait([item], timeout=poll).done:
+                    if cancel.is_set():
+                        return
+                result = item.result()
+                slots.release()
+                yield result
+        finally:
+            # consumer gone, failed or cancelled: the producer exits at its next segment,
+            # and is joined so it never submits to the pool after shutdown
+            stop.set()
+            slots.release()
+            producer.join()
+            while True:
+                try:
+                    item = submitted.get_nowait()
+                except queue.Empty:
+                    break
+                if not isinstance(item, BaseException) and item is not None and item.cancel() and limiter is not None:
+                    limiter.release()  # never ran, so its slot was never released
+
+def transcribe_stream(segments:Iterable[Segment], max_workers:int, max_in_flight:int|None = None, recognizer:Recognizer|None = None, cache:TranscriptCache|None = None, limiter:AdaptiveLimiter|None = None) -> Iterator[str]:
+    """Like `transcribe_segments`, yielding only the texts."""
+    for result in transcribe_segments(segments, max_workers, max_in_flight, recognizer, cache, limiter):
+        yield result[3]
+
+def iter_transcribe_audio(file_path, segment_duration=30, vad=False, recognizer:Recognizer|None = None, cache:TranscriptCache|None = None, limiter:AdaptiveLimiter|None = None, cancel:threading.Event|None = None) -> Iterator[TranscriptSegment]:
+    """
+    Yields the transcript segment by segment, in order, as soon as each prefix is complete.
+
+    `file_path` may also be an iterable of encoded bytes, e.g. `urlChunks(url)`.
+    By default the audio is cut every `segment_duration` seconds. With `vad` segments
+    are cut in pauses, up to 1.5x `segment_duration` seconds long, and non-speech is
+    skipped; this only saves calls on recordings with frequent pauses (see vad.py).
+
+    With a `cache`, recognized segments are reused, and for files a complete
+    transcript is replayed straight from the cache when the file is unchanged.
+
+    Recognizer concurrency is adapted by `limiter` (by default an `AdaptiveLimiter`
+    bounded by `get_thread_cnt()`); read `limiter.history` for the chosen limits.
+    Setting `cancel` stops the transcription, also while it waits on a segment.
+    """
+    limiter = limiter or AdaptiveLimiter(initial=2, maximum=get_thread_cnt())
+    recognizer = recognizer or getRecognizer()
+    key = None
+    if cache is not None and isinstance(file_path, str):
+        key = manifestKey(fileHash(file_path), recognizer.id, {"segment_duration": segment_duration, "vad": vad})
+        rows = cache.manifest(key)
+        if rows is not None:
+            for row in rows:
+                yield TranscriptSegment(*row)
+            return
+
+    rows, complete = [], True
+    with PcmDecoder(file_path) as decoder:
+        if vad:
+            segments = VadSegmenter(target=segment_duration, minLength=segment_duration / 3, maxLength=segment_duration * 1.5).segments(decoder)
+        else:
+            segments = NoiseCalibrator().attach(fixedSegments(decoder, segment_duration))
+        results = transcribe_segments(segments, limiter.maximum, recognizer=recognizer, cache=cache, limiter=limiter, cancel=cancel)
+        try:
+            for index, start, end, text, ok in results:
+                rows.append((index, start, end, text))
+                complete = complete and ok
+                yield TranscriptSegment(index, start, end, text, None if ok else text)
+        finally:
+            results.close()  # joins the producer, which reads the decoder, before the decoder is closed
+    if cancel is not None and cancel.is_set():
+        return
+    if key is not None and complete:
+        cache.putManifest(key, rows)
+
+def transcribe_audio(file_path, segment_duration=30, vad=False, recognizer:Recognizer|None = None, cache:TranscriptCache|None = None, limiter:AdaptiveLimiter|None = None):
+    """Blocking form of `iter_transcribe_audio`: returns the joined transcript."""
+    transcription = " ".join(segment.text for segment in iter_transcribe_audio(file_path, segment_duration, vad, recognizer, cache, limiter))
+    return transcription
+
+def iterTranscript(audio_source:str, is_url=False, recognizer:str|Recognizer|None = None, cache:str|TranscriptCache|None = "default", limiter:AdaptiveLimiter|None = None, vad:bool = False, cancel:threading.Event|None = None) -> Iterator[TranscriptSegment]:
+    """
+    Streaming form of `transcriptAudio`: yields `TranscriptSegment(index, start, end, text, error)`
+    in order while the rest of the recording is still being recognized; `error` is
+    set for segments whose request failed. `vad` cuts segments in pauses instead
+    of every 30 seconds (see `iter_transcribe_audio`). Setting `cancel` (a
+    `threading.Event`) stops it from another thread.
+
+    Examples
+    --------
+    >>> for segment in iterTranscript("meeting.mp3"):
+    ...     print(f"[{segment.start:.0f}s] {segment.text}")
+    """
+    if not isinstance(recognizer, Recognizer):
+        recognizer = getRecognizer(recognizer)
+    owned = isinstance(cache, str)
+    if owned:
+        cache = TranscriptCache(".transcripts.sqlite" if cache == "default" else cache)
+    try:
+        # for URLs, download, decoding and recognition overlap
+        source = urlChunks(audio_source) if is_url else audio_source
+        yield from iter_transcribe_audio(source, vad=vad, recognizer=recognizer, cache=cache, limiter=limiter, cancel=cancel)
+    finally:
+        if owned:
+            cache.close()  # opened from a path here, so closed here; a passed-in cache stays open
+
+async def aiterTranscript(audio_source:str, is_url=False, recognizer:str|Recognizer|None = None, cache:str|TranscriptCache|None = "default", limiter:AdaptiveLimiter|None = None, vad:bool = False) -> AsyncIterator[TranscriptSegment]:
+    """
+    Async iterator over `iterTranscript`, which runs on a helper thread so the event loop is never blocked.
+
+    Examples
+    --------
+    >>> async for segment in aiterTranscript("meeting.mp3"):
+    ...     await summarizer.feed(segment.text)
+    """
+    loop = asyncio.get_running_loop()
+    results:asyncio.Queue = asyncio.Queue()
+    closed = threading.Event()
+
+    def run() -> None:
+        try:
+            # `closed` is checked while waiting on a segment, not only when one arrives
+            for segment in iterTranscript(audio_source, is_url, recognizer, cache, limiter, vad, cancel=closed):
+                loop.call_soon_threadsafe(results.put_nowait, segment)
+        except BaseException as e:
+            if not closed.is_set():
+                loop.call_soon_threadsafe(results.put_nowait, e)
+        finally:
+            if not closed.is_set():
+                loop.call_soon_threadsafe(results.put_nowait, None)
+
+    thread = threading.Thread(target=run, name="transcript-iter", daemon=True)
+    thread.start()
+    try:
+        while (item := await results.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        closed.set()
+        await asyncio.to_thread(thread.join)  # decoder and cache are closed once this returns
+
+def transcriptAudio(audio_source:str, is_url=False, recognizer:str|Recognizer|None = None, cache:str|TranscriptCache|None = "default", limiter:AdaptiveLimiter|None = None, vad:bool = False) -> str:
+    """
+    Parameters
+    ----------
+    audio_source : str
+        The audio source to transcribe.
+    is_url : bool, optional
+        Whether the audio source is a URL, by default False
+    recognizer : str | Recognizer | None, optional
+        Backend instance or registered name ("google", "offline", "whisper", "sphinx"),
+        by default TRANSCRIPT_RECOGNIZER or "google"
+    cache : str | TranscriptCache | None, optional
+        Transcript cache or the path of its SQLite file, by default ".transcripts.sqlite";
+        None disables caching
+    limiter : AdaptiveLimiter | None, optional
+        Controls recognizer concurrency; pass one to inspect `limiter.history` afterwards
+    vad : bool, optional
+        Cut segments in pauses and skip non-speech instead of cutting every 30 seconds;
+        only saves calls on recordings with frequent pauses, by default False
+
+    Returns
+    -------
+    str
+        The transcription of the audio source.
+    """
+    transcription = " ".join(segment.text for segment in iterTranscript(audio_source, is_url, recognizer, cache, limiter, vad))
+
+    return transcription
+
+
+
+
+@TimeIt
+def main(audio_source, is_url=False):
+    transcription = transcriptAudio(audio_source, is_url)
+    
+    print(transcription)
+
+if __name__ == "__main__":
+    # Example usage:
+    # audio_url = "https://github.com/AssemblyAI-Examples/audio-examples/raw/main/20230607_me_canadian_wildfires.mp3"
+
+    local_file_path = r"C:\Users\Divyansh\Desktop\YT\Ai\plugins\transcript\ttsMP3.com_VoiceText_2024-6-14_16-30-38.mp3"
+
+    # For URL
+    # main(audio_url, is_url=True)
+
+    # print("-"*100)
+
+    # # For local file
+    main(local_file_path, is_url=False)
+
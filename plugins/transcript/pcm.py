@@ -0,0 +1,167 @@
+"""
+Streaming PCM decoding for the transcript pipeline.
+
+ffmpeg decodes the source once to 16 kHz mono signed 16-bit little-endian PCM on
+its stdout. Segments are read straight from the pipe into their own buffers and
+handed on as memoryviews, so nothing is written to disk and only the segments
+currently in flight are held in memory.
+"""
+from typing import Iterable, Iterator, NamedTuple
+import subprocess
+import threading
+import os
+
+import requests
+
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # s16le
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+
+def ffmpegExe() -> str:
+    return os.getenv("FFMPEG_BINARY") or "ffmpeg"
+
+class Segment(NamedTuple):
+    index: int
+    start: float  # seconds
+    end: float
+    pcm: memoryview
+    threshold: float|None = None  # speech energy threshold from the recording's noise calibration
+
+    def audio(self) -> sr.AudioData:
+        return toAudioData(self.pcm)
+
+def urlChunks(url:str, chunk_size:int = 1 << 16, timeout:float = 30.0) -> Iterator[bytes]:
+    """Streams an HTTP body in chunks instead of loading `response.content`."""
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise Exception(f"Failed to download audio file from URL: {url} ({response.status_code})")
+        yield from response.iter_content(chunk_size)
+
+def toAudioData(pcm) -> sr.AudioData:
+    """Wraps PCM bytes (or a view of them) for `speech_recognition` without copying."""
+    return sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
+
+class PcmDecoder:
+    """
+    Runs ffmpeg on `source` and exposes its PCM output.
+
+    `source` is a file path, or an iterable of encoded bytes (e.g. `urlChunks(url)`)
+    that a feeder thread writes to ffmpeg's stdin, so decoding starts with the
+    first chunk instead of after the whole download. Streamed input must be a
+    format ffmpeg can read sequentially (mp3, ogg, wav, webm; not mp4 with the
+    index at the end).
+
+    Examples
+    --------
+    >>> with PcmDecoder("talk.mp3") as decoder:
+    ...     for segment in fixedSegments(decoder, 30):
+    ...         print(segment.start, len(segment.pcm))
+    >>> with PcmDecoder(urlChunks("https://example.com/talk.mp3")) as decoder:
+    ...     pcm = decoder.read(BYTES_PER_SECOND)
+    """
+    def __init__(self, source:str|Iterable[bytes]) -> None:
+        streamed = not isinstance(source, str)
+        self.source = "<stream>" if streamed else source
+        self.process = subprocess.Popen(
+            [ffmpegExe(), *([] if streamed else ["-nostdin"]), "-v", "error", "-i", "pipe:0" if streamed else source,
+             "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+            stdin=subprocess.PIPE if streamed else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        self.bytesRead = 0
+        self.bytesFed = 0
+        self.feedError:BaseException|None = None
+        self.feeder:threading.Thread|None = None
+        # ffmpeg's stderr is drained continuously so a chatty decoder never blocks on a full pipe
+        self.stderr = bytearray()
+        self.stderrReader = threading.Thread(target=self._drainStderr, daemon=True)
+        self.stderrReader.start()
+        if streamed:
+            self.feeder = threading.Thread(target=self._feed, args=(source,), daemon=True)
+            self.feeder.start()
+
+    def _feed(self, chunks:Iterable[bytes]) -> None:
+        try:
+            for chunk in chunks:
+                self.process.stdin.write(chunk)
+                self.bytesFed += len(chunk)
+        except (BrokenPipeError, OSError) as e:
+            if self.process.poll() is None:
+                self.feedError = e
+        except BaseException as e:  # download failed: ffmpeg sees EOF, close() reports why
+            self.feedError = e
+        finally:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def _drainStderr(self) -> None:
+        for line in iter(self.process.stderr.readline, b""):
+            self.stderr += line
+            del self.stderr[:-65536]  # keep the last 64 KiB
+
+    def readinto(self, buf) -> int:
+        """Fills `buf` completely unless the stream ends; returns the number of bytes read."""
+        view = memoryview(buf)
+        filled = 0
+        while filled < len(view):
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+        self.bytesRead += filled
+        return filled
+
+    def read(self, size:int) -> memoryview:
+        buf = bytearray(size)
+        return memoryview(buf)[:self.readinto(buf)]
+
+    def close(self, check:bool = True) -> None:
+        """
+        Stops ffmpeg. With `check`, a failed download (the primary error) or a
+        failed decode is raised; `__exit__` passes False while another exception
+        is already propagating so that one is not masked.
+        """
+        if self.process.poll() is None and self.process.stdout.read(1):
+            self.process.kill()  # stopped early, the remaining output is not wanted
+            self.process.wait()  # a feeder thread stops at its next write
+            return
+        self.process.wait()
+        self.stderrReader.join()
+        if not check:
+            return  # a feeder still waiting on the network exits at its next write
+        if self.feeder is not None:
+            self.feeder.join()
+        if self.feedError is not None:
+            raise self.feedError
+        if self.process.returncode != 0:
+            error = self.stderr.decode("utf-8", errors="ignore").strip()
+            raise RuntimeError(f"ffmpeg failed to decode {self.source}: {error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.close(check=False)
+
+def fixedSegments(decoder:PcmDecoder, segment_duration:float = 30) -> Iterator[Segment]:
+    """
+    Cuts the stream into consecutive `segment_duration` second segments, each
+    read from the pipe into a buffer of its own.
+    """
+    size = int(segment_duration * SAMPLE_RATE) * SAMPLE_WIDTH
+    index, offset = 0, 0
+    while len(pcm := decoder.read(size)):
+        yield Segment(index, offset / BYTES_PER_SECOND, (offset + len(pcm)) / BYTES_PER_SECOND, pcm)
+        index += 1
+        offset += len(pcm)
@@ -0,0 +1,123 @@
+"""
+Speech recognizer backends for the transcript pipeline.
+
+Every backend turns one in-memory `sr.AudioData` segment into text and signals
+failures the way `speech_recognition` does: `sr.UnknownValueError` when nothing
+was understood, `sr.RequestError` when the service could not be used.
+
+>>> recognizer = getRecognizer("offline", latency=0.2)
+>>> recognizer.recognize(segment.audio())
+"""
+from abc import ABC, abstractmethod
+import threading
+import hashlib
+import time
+import os
+import numpy as np
+import speech_recognition as sr
+
+RECOGNIZERS:dict[str, type] = {}
+
+def register(name:str):
+    def decorator(cls:type) -> type:
+        cls.name = name
+        RECOGNIZERS[name] = cls
+        return cls
+    return decorator
+
+def getRecognizer(name:str|None = None, **kwargs) -> "Recognizer":
+    """
+    Creates a registered backend; by default the one named by the
+    TRANSCRIPT_RECOGNIZER environment variable, or "google".
+    """
+    name = name or os.getenv("TRANSCRIPT_RECOGNIZER") or "google"
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer {name!r}, available: {', '.join(sorted(RECOGNIZERS))}")
+    return RECOGNIZERS[name](**kwargs)
+
+class Recognizer(ABC):
+    name = "base"
+    version = "1"
+
+    @abstractmethod
+    def recognize(self, audio:sr.AudioData) -> str:
+        ...
+
+    @property
+    def id(self) -> str:
+        """Backend name and version, e.g. "google/v2"."""
+        return f"{self.name}/{self.version}"
+
+@register("google")
+class GoogleRecognizer(Recognizer):
+    """The free Google Web Speech API (needs network access)."""
+    version = "v2"
+
+    def __init__(self, language:str = "en-US", key:str|None = None) -> None:
+        self.language = language
+        self.key = key
+        self.version = f"v2-{language}"
+
+    def recognize(self, audio:sr.AudioData) -> str:
+        return sr.Recognizer().recognize_google(audio, key=self.key, language=self.language)
+
+@register("offline")
+class OfflineRecognizer(Recognizer):
+    """
+    Deterministic stand-in for benchmarks and tests: sleeps `latency` seconds
+    plus `perSecond` seconds per second of audio, then returns text derived from
+    a hash of the PCM, so the same audio always gives the same transcript.
+    """
+    version = "1"
+
+    def __init__(self, latency:float = 0.0, perSecond:float = 0.0, words:int = 8) -> None:
+        self.latency = latency
+        self.perSecond = perSecond
+        self.words = words
+
+    def recognize(self, audio:sr.AudioData) -> str:
+        pcm = audio.frame_data
+        seconds = len(pcm) / (audio.sample_rate * audio.sample_width)
+        delay = self.latency + self.perSecond * seconds
+        if delay:
+            time.sleep(delay)
+        if not np.any(np.frombuffer(pcm, dtype=np.uint8)):
+            raise sr.UnknownValueError()
+        digest = hashlib.sha1(pcm).hexdigest()
+        return " ".join(f"w{digest[i * 4:i * 4 + 4]}" for i in range(min(self.words, 10)))
+
+@register("whisper")
+class WhisperRecognizer(Recognizer):
+    """
+    Local faster-whisper model, loaded once and shared by all worker threads.
+    Optional: `pip install faster-whisper`.
+    """
+    def __init__(self, model:str = "base", device:str = "cpu", compute_type:str = "int8", language:str|None = None) -> None:
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model, device=device, compute_type=compute_type)
+        self.language = language
+        self.version = f"faster-whisper-{model}"
+
+    def recognize(self, audio:sr.AudioData) -> str:
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype="<i2").astype(np.float32) / 32768
+        segments, _ = self.model.transcribe(samples, language=self.language)
+        text = " ".join(s.text.strip() for s in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+@register("sphinx")
+class SphinxRecognizer(Recognizer):
+    """
+    CMU Sphinx through `speech_recognition`. Optional: `pip install pocketsphinx`.
+    The decoder is not thread-safe, so calls are serialized.
+    """
+    def __init__(self, language:str = "en-US") -> None:
+        import pocketsphinx  # noqa: F401, fail early when it is missing
+        self.language = language
+        self.version = f"pocketsphinx-{language}"
+        self.lock = threading.Lock()
+
+    def recognize(self, audio:sr.AudioData) -> str:
+        with self.lock:
+            return sr.Recognizer().recognize_sphinx(audio, language=self.language)
@@ -0,0 +1,203 @@
+"""
+Energy / zero-crossing voice activity detection over 16-bit PCM, vectorized with NumPy.
+
+`VadSegmenter` is an alternative to fixed-length slicing: it cuts in the last
+pause before `maxLength` (so words are not split and segments are packed as long
+as allowed) and drops spans without speech instead of sending them to the recognizer.
+
+It is opt-in (`vad=True`). Measured with `bench.py` (offline recognizer, 0.5 s per
+call + 0.02 s per audio second, 4 threads, 19 min recordings):
+
+    recording                         fixed 30 s         VAD
+    speech with 0.6-1.2 s pauses      38 calls, 11.0 s   29 calls, 9.6 s
+    27 s of speech + 4 s pauses       38 calls, 11.0 s   41 calls, 10.9 s
+
+When the pauses are further apart than `maxLength` allows to pack, every pause
+still becomes a cut and VAD makes more calls than fixed slicing.
+"""
+from typing import Iterable, Iterator
+import numpy as np
+
+try:from transcript.pcm import PcmDecoder, Segment, SAMPLE_RATE, SAMPLE_WIDTH, BYTES_PER_SECOND
+except ImportError:from plugins.transcript.pcm import PcmDecoder, Segment, SAMPLE_RATE, SAMPLE_WIDTH, BYTES_PER_SECOND
+
+FRAME_MS = 30
+
+def frameFeatures(pcm, frameMs:int = FRAME_MS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-frame RMS energy and zero-crossing rate of s16le PCM (a trailing partial frame is ignored).
+    """
+    frameLen = SAMPLE_RATE * frameMs // 1000
+    samples = np.frombuffer(pcm, dtype="<i2")
+    frames = samples[:len(samples) // frameLen * frameLen].reshape(-1, frameLen).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+    return rms, zcr
+
+def noiseFloor(rms:np.ndarray, floorPercentile:float = 10) -> float:
+    """A low percentile of the frame energies: the level of the quiet frames between words."""
+    return float(np.percentile(rms, floorPercentile)) if len(rms) else 0.0
+
+class NoiseCalibrator:
+    """
+    Noise profile of one recording, measured on the first window and shared by
+    every segment after it.
+
+    A quieter window lowers the floor right away. A louder one only starts a new
+    acoustic region (another room or microphone) when the floor stays `regionRatio`
+    times higher for `regionWindows` windows in a row, so a stretch of continuous
+    speech does not raise the threshold.
+    """
+    def __init__(self, floorPercentile:float = 10, factor:float = 3.0, minimum:float = 100.0, regionRatio:float = 4.0, regionWindows:int = 2) -> None:
+        self.floorPercentile = floorPercentile
+        self.factor = factor
+        self.minimum = minimum
+        self.regionRatio = regionRatio
+        self.regionWindows = regionWindows
+        self.floor:float|None = None
+        self.regions = 0
+        self.louder = 0
+
+    @property
+    def threshold(self) -> float:
+        return max((self.floor or 0.0) * self.factor, self.minimum)
+
+    def update(self, rms:np.ndarray) -> float:
+        """Feeds the frame energies of the next window; returns the threshold to use for it."""
+        if not len(rms):
+            return self.threshold
+        floor = noiseFloor(rms, self.floorPercentile)
+        if self.floor is None:
+            self.floor, self.regions = floor, 1
+        elif floor <= self.floor:
+            self.floor, self.louder = floor, 0
+        elif floor > self.floor * self.regionRatio:
+            self.louder += 1
+            if self.louder >= self.regionWindows:
+                self.floor, self.louder = floor, 0
+                self.regions += 1
+        else:
+            self.louder = 0
+        return self.threshold
+
+    def attach(self, segments:Iterable[Segment]) -> Iterator[Segment]:
+        """Calibrates on fixed-length segments and stamps each with the threshold."""
+        for segment in segments:
+            yield segment._replace(threshold=self.update(frameFeatures(segment.pcm)[0]))
+
+def hasSpeech(pcm, threshold:float) -> bool:
+    rms, zcr = frameFeatures(pcm)
+    return bool(speechMask(rms, zcr, threshold, hangoverFrames=0).any())
+
+def speechMask(rms:np.ndarray, zcr:np.ndarray, threshold:float, hangoverFrames:int = 10) -> np.ndarray:
+    """
+    True for frames that contain speech. Quiet frames with a high zero-crossing
+    rate (fricatives such as "s" and "f") count as speech, and every speech frame
+    extends `hangoverFrames` to both sides so word edges are not clipped.
+    """
+    speech = (rms > threshold) | ((rms > threshold / 2) & (zcr > 0.3))
+    if hangoverFrames and speech.any():
+        kernel = np.ones(2 * hangoverFrames + 1, dtype=np.int32)
+        speech = np.convolve(speech.astype(np.int32), kernel, mode="same") > 0
+    return speech
+
+def _silenceRuns(speech:np.ndarray) -> np.ndarray:
+    """Length of the silent run each frame belongs to (0 for speech frames)."""
+    silent = ~speech
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    runs = np.zeros(len(speech), dtype=np.int64)
+    for start, stop in zip(edges[::2], edges[1::2]):
+        runs[start:stop] = stop - start
+    return runs
+
+class VadSegmenter:
+    def __init__(self,
+                target:float = 30,
+                minLength:float = 10,
+                maxLength:float = 45,
+                threshold:float|None = None,
+                calibrator:NoiseCalibrator|None = None,
+                minSilence:float = 0.3,
+                frameMs:int = FRAME_MS,
+                ) -> None:
+        """
+        Parameters
+        ----------
+        target : float, optional
+            Preferred segment length in seconds, by default 30
+        minLength : float, optional
+            Shortest segment cut in a silence, by default 10
+        maxLength : float, optional
+            Longest segment; without a silence before it the cut is forced, by default 45
+        threshold : float | None, optional
+            Fixed RMS energy threshold for speech, by default calibrated from the recording
+        calibrator : NoiseCalibrator | None, optional
+            Noise profile to calibrate with, by default a new one per segmenter
+        minSilence : float, optional
+            Silences at least this long (seconds) are preferred as cut points, by default 0.3
+        frameMs : int, optional
+            Analysis frame length in milliseconds, by default 30
+        """
+        self.target = target
+        self.minLength = minLength
+        self.maxLength = maxLength
+        self.threshold = threshold
+        self.calibrator = calibrator or NoiseCalibrator()
+        self.minSilence = minSilence
+        self.frameMs = frameMs
+        self.frameBytes = SAMPLE_RATE * frameMs // 1000 * SAMPLE_WIDTH
+        self.speechSeconds = 0.0
+        self.droppedSeconds = 0.0
+
+    def _cut(self, speech:np.ndarray, final:bool) -> int:
+        """Frame index to cut the window at."""
+        perSecond = 1000 / self.frameMs
+        if final and len(speech) <= self.maxLength * perSecond:
+            return len(speech)
+        lo, hi = int(self.minLength * perSecond), min(int(self.maxLength * perSecond), len(speech))
+        target = int(self.target * perSecond)
+        runs = _silenceRuns(speech)[lo:hi]
+        # pack: the last real pause before maxLength gives the fewest, longest segments
+        candidates = np.flatnonzero(runs >= int(self.minSilence * perSecond))
+        if len(candidates):
+            return lo + int(candidates[-1])
+        candidates = np.flatnonzero(runs >= 1)
+        if len(candidates):
+            return lo + int(candidates[np.argmin(np.abs(candidates + lo - target))])
+        return hi
+
+    def segments(self, decoder:PcmDecoder) -> Iterator[Segment]:
+        """
+        Reads the decoder's PCM and yields speech segments with absolute timestamps.
+        Memory is bounded by one `maxLength` window plus the segments still referenced downstream.
+        """
+        window = int(self.maxLength * BYTES_PER_SECOND) // self.frameBytes * self.frameBytes
+        buffer = bytearray()
+        base = 0  # absolute byte offset of buffer[0]
+        index = 0
+        final = False
+        while buffer or not final:
+            if not final and len(buffer) < window:
+                chunk = decoder.read(window - len(buffer))
+                final = len(chunk) < window - len(buffer)
+                buffer += chunk
+                if not final:
+                    continue
+            rms, zcr = frameFeatures(buffer, self.frameMs)
+            threshold = self.threshold if self.threshold is not None else self.calibrator.update(rms)
+            speech = speechMask(rms, zcr, threshold)
+            cut = self._cut(speech, final)
+            cutBytes = len(buffer) if final and cut == len(speech) else cut * self.frameBytes
+            voiced = np.flatnonzero(speech[:cut])
+            view = memoryview(buffer)
+            if len(voiced):
+                start = int(voiced[0]) * self.frameBytes
+                stop = min((int(voiced[-1]) + 1) * self.frameBytes, cutBytes)
+                yield Segment(index, (base + start) / BYTES_PER_SECOND, (base + stop) / BYTES_PER_SECOND, view[start:stop], threshold)
+                index += 1
+                self.speechSeconds += (stop - start) / BYTES_PER_SECOND
+                self.droppedSeconds += (cutBytes - stop + start) / BYTES_PER_SECOND
+            else:
+                self.droppedSeconds += cutBytes / BYTES_PER_SECOND
+            buffer = bytearray(view[cutBytes:])  # the yielded view keeps the old buffer alive, no copy of it
+            base += cutBytes
@@ -0,0 +1,127 @@
+"""
+Gemini provider against an in-process stub of `google.generativeai`, no network.
+
+    python -m pytest tests/test_gemini.py
+"""
+from types import SimpleNamespace
+import threading
+import io
+
+import pytest
+
+from llm.Gemini import LLM, FileCache
+from llm.Tracing import tracer
+from llm.Sink import ThrottledSink
+
+class StubFile:
+    def __init__(self, name: str, polls: int) -> None:
+        self.name = name
+        self.uri = f"stub://{name}"
+        self.display_name = name
+        self.polls = polls  # PROCESSING for this many get_file calls
+
+    @property
+    def state(self):
+        return SimpleNamespace(name="PROCESSING" if self.polls > 0 else "ACTIVE")
+
+class StubModel:
+    def __init__(self, api: "StubGenai", **kwargs) -> None:
+        self.api = api
+        self.kwargs = kwargs
+
+    def generate_content(self, contents, stream=False):
+        self.api.requests.append((self.kwargs, contents))
+        return [SimpleNamespace(text="hello "), SimpleNamespace(text="there")]
+
+class StubGenai:
+    def __init__(self, polls: int = 2) -> None:
+        self.polls = polls
+        self.configured = 0
+        self.uploads = 0
+        self.files: dict[str, StubFile] = {}
+        self.requests: list[tuple[dict, list]] = []
+        self.lock = threading.Lock()
+
+    def configure(self, api_key=None) -> None:
+        self.configured += 1
+
+    def GenerativeModel(self, **kwargs) -> StubModel:
+        return StubModel(self, **kwargs)
+
+    def upload_file(self, path, mime_type=None) -> StubFile:
+        with self.lock:
+            self.uploads += 1
+            file = self.files[f"files/{self.uploads}"] = StubFile(f"files/{self.uploads}", self.polls)
+        return file
+
+    def get_file(self, name) -> StubFile:
+        file = self.files[name]
+        file.polls -= 1
+        return file
+
+def makeLLM(tmp_path, api: StubGenai, **kwargs) -> LLM:
+    return LLM(api_key="test", genai_api=api, files_api=api, cache=FileCache(str(tmp_path / "files.json")), poll_interval=0.001, **kwargs)
+
+def test_uploads_wait_until_active_and_are_cached(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"clip{i}.ogg"
+        path.write_bytes(b"audio %d" % i)
+        paths.append(str(path))
+    api = StubGenai(polls=2)
+    files = makeLLM(tmp_path, api).upload(*paths)
+    assert [f.state.name for f in files] == ["ACTIVE"] * 3
+    assert api.uploads == 3
+
+    # a new instance reuses the persisted handles instead of uploading again
+    again = makeLLM(tmp_path, api).upload(*paths)
+    assert api.uploads == 3
+    assert [f.name for f in again] == [f.name for f in files]
+
+def test_system_messages_become_the_system_instruction(tmp_path):
+    api = StubGenai()
+    llm = makeLLM(tmp_path, api, system_prompt="be brief")
+    llm.add_message(llm.SYSTEM, "answer in English")
+    llm.add_message("user", "hi")
+    llm.add_message("assistant", "hello")
+    assert llm.run("how are you") == "hello there"
+
+    kwargs, contents = api.requests[-1]
+    assert kwargs["system_instruction"] == "be brief\n\nanswer in English"
+    assert [c["role"] for c in contents] == ["user", "model", "user"]
+
+def test_configure_is_called_once(tmp_path):
+    api = StubGenai()
+    llm = makeLLM(tmp_path, api)
+    for _ in range(3):
+        llm.run("ping")
+    llm.add_message(llm.SYSTEM, "new rules")
+    llm.run("ping")
+    assert api.configured == 1
+
+def test_stream_records_time_to_first_token(tmp_path):
+    llm = makeLLM(tmp_path, StubGenai())
+    tracer.configure(1.0)
+    try:
+        tracer.clear()
+        llm.run("ping")
+        names = [e["name"] for e in tracer.events]
+    finally:
+        tracer.configure(0.0)
+        tracer.clear()
+    assert names.count("llm.ttft") == 1 and "llm.stream" in names
+
+def test_sink_is_flushed_when_the_stream_fails(tmp_path):
+    class Failing(StubModel):
+        def generate_content(self, contents, stream=False):
+            yield SimpleNamespace(text="partial ")
+            yield SimpleNamespace(text="answer")
+            raise ConnectionError("stream reset")
+
+    api = StubGenai()
+    api.GenerativeModel = lambda **kwargs: Failing(api, **kwargs)
+    out = io.StringIO()
+    sink = ThrottledSink(fps=0.001, stream=out)  # the rest after the first write waits for close
+    with pytest.raises(ConnectionError):
+        makeLLM(tmp_path, api).run("ping", sink=sink)
+    assert out.getvalue() == "partial answer"
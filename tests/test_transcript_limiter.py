@@ -0,0 +1,47 @@
+"""
+Adaptive concurrency of the transcript plugin with a stub recognizer, no network.
+
+    python -m pytest tests/test_transcript_limiter.py
+"""
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("nara.extra")  # the transcript package imports it
+from plugins.transcript.main import transcribe_segments
+from plugins.transcript.limiter import AdaptiveLimiter
+from plugins.transcript.recognizers import Recognizer
+from plugins.transcript.pcm import Segment, SAMPLE_RATE
+
+SECONDS = 2
+
+class Constant(Recognizer):
+    name = "constant"
+
+    def recognize(self, audio) -> str:
+        time.sleep(0.1)
+        return "ok"
+
+def segments(count:int):
+    t = np.arange(SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype("<i2").tobytes()
+    silence = bytes(len(tone))
+    for index in range(count):
+        pcm = silence if index % 4 == 0 else tone  # every fourth segment is silent
+        yield Segment(index, index * SECONDS, (index + 1) * SECONDS, memoryview(pcm), threshold=100.0)
+
+def test_silent_segments_do_not_hold_the_limit_down():
+    limiter = AdaptiveLimiter(initial=2, maximum=8)
+    results = list(transcribe_segments(segments(60), 8, recognizer=Constant(), limiter=limiter))
+    assert [r[3] for r in results[:4]] == ["*", "ok", "ok", "ok"]
+    # skipped silence is not a latency sample, so the baseline stays near the real calls
+    assert limiter.baseline == pytest.approx(0.1 / SECONDS, rel=0.5)
+    assert limiter.peak >= 6
+
+def test_latency_is_compared_per_second_of_audio():
+    limiter = AdaptiveLimiter(initial=4, maximum=8, cooldown=0)
+    for seconds in (10, 30, 45, 20):  # same speed, segments of different length
+        limiter.acquire()
+        limiter.release(latency=seconds * 0.05, seconds=seconds)
+    assert [reason for _, _, reason in limiter.history] == ["start"]
@@ -0,0 +1,112 @@
+"""
+Streamed URL input of the transcript plugin against a local HTTP server.
+
+    python -m pytest tests/test_transcript_url.py
+
+Needs ffmpeg on PATH (or FFMPEG_BINARY).
+"""
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+import threading
+import shutil
+import wave
+
+import numpy as np
+import pytest
+
+pytest.importorskip("nara.extra")  # the transcript package imports it
+from plugins.transcript.pcm import PcmDecoder, urlChunks, fixedSegments, ffmpegExe, SAMPLE_RATE, BYTES_PER_SECOND
+
+pytestmark = pytest.mark.skipif(shutil.which(ffmpegExe()) is None, reason="ffmpeg not found")
+
+SECONDS = 7
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    root = tmp_path_factory.mktemp("audio")
+    t = np.arange(SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    samples = (np.sin(2 * np.pi * 440 * t) * 8000 * (t % 2 < 1)).astype("<i2")  # 1 s tone, 1 s silence
+    with wave.open(str(root / "tone.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+    with wave.open(str(root / "long.wav"), "wb") as f:  # five 30 s segments
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(np.tile(samples, 125 // SECONDS + 1)[:125 * SAMPLE_RATE].tobytes())
+    (root / "garbage.mp3").write_bytes(b"not audio at all" * 1000)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(root)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", root
+    httpd.shutdown()
+
+def test_streamed_url_decodes_like_the_file(server):
+    url, root = server
+    with PcmDecoder(str(root / "tone.wav")) as decoder:
+        expected = bytes(decoder.read(SECONDS * BYTES_PER_SECOND * 2))
+    with PcmDecoder(urlChunks(f"{url}/tone.wav", chunk_size=4096)) as decoder:
+        segments = list(fixedSegments(decoder, 2))
+    assert [s.index for s in segments] == [0, 1, 2, 3]
+    assert segments[-1].end == pytest.approx(SECONDS)
+    assert b"".join(bytes(s.pcm) for s in segments) == expected
+
+def test_failed_download_is_raised_not_the_ffmpeg_error(server):
+    url, _ = server
+    with pytest.raises(Exception, match="404"):
+        with PcmDecoder(urlChunks(f"{url}/missing.mp3")) as decoder:
+            list(fixedSegments(decoder, 2))
+
+def test_undecodable_stream_reports_ffmpeg_stderr(server):
+    url, _ = server
+    with pytest.raises(RuntimeError, match="ffmpeg failed to decode <stream>: .+"):
+        with PcmDecoder(urlChunks(f"{url}/garbage.mp3")) as decoder:
+            list(fixedSegments(decoder, 2))
+
+def test_error_inside_the_block_is_not_masked(server):
+    url, _ = server
+    with pytest.raises(KeyError):
+        with PcmDecoder(urlChunks(f"{url}/garbage.mp3")):
+            raise KeyError("consumer failed")
+
+def test_iter_transcript_streams_url_segments(server):
+    from plugins.transcript.main import iterTranscript
+    url, _ = server
+    segments = list(iterTranscript(f"{url}/tone.wav", is_url=True, recognizer="offline", cache=None))
+    assert len(segments) == 1 and segments[0].end == pytest.approx(SECONDS)
+
+def test_closing_the_async_iterator_stops_a_slow_transcription(server):
+    import asyncio
+    import time
+    from plugins.transcript.main import aiterTranscript
+    from plugins.transcript.recognizers import Recognizer
+
+    class Slow(Recognizer):
+        name = "slow"
+        def __init__(self) -> None:
+            self.calls = 0
+        def recognize(self, audio) -> str:
+            self.calls += 1
+            time.sleep(0.2 if self.calls == 1 else 3)
+            return "ok"
+
+    url, _ = server
+    recognizer = Slow()
+
+    async def first():
+        segments = aiterTranscript(f"{url}/long.wav", is_url=True, recognizer=recognizer, cache=None)
+        segment = await segments.__anext__()
+        start = time.monotonic()
+        await asyncio.wait_for(segments.aclose(), timeout=10)
+        return segment, time.monotonic() - start
+
+    segment, closing = asyncio.run(first())
+    assert segment.index == 0
+    # only the calls already running are waited for, not the remaining segments
+    assert closing < 5 and recognizer.calls <= 3
+    assert not any(t.name in ("transcript-producer", "transcript-iter") for t in threading.enumerate())